@@ -0,0 +1,399 @@
+"""
+HTTP API for embedding the English teacher in other applications.
+
+A small HTTP/1.1 server on asyncio: every student is served by the same
+event loop through AsyncEnglishTeacher. Sessions live on the server and are
+unloaded after Config.API_SESSION_TTL idle seconds; their exchanges stay in
+the conversation store, so a returning student picks up where they left off.
+
+Endpoints (JSON in and out):
+    GET    /health
+    GET    /metrics                       Prometheus text format
+    POST   /sessions                      {"student_id"} (optional) -> {"session_id"}
+    POST   /sessions/<id>/messages        {"message", "mode", "level", "stream"} -> turn result,
+                                          or server-sent events when "stream" is true
+    POST   /sessions/<id>/analysis        {"text", "mode", "level"} -> analysis
+    GET    /sessions/<id>/summary         -> {"summary"}
+    GET    /sessions/<id>/history         ?page=0&page_size=10 -> {"exchanges", "total"}
+    GET    /sessions/<id>/progress        -> {"progress", "frequent_mistakes"} of the session's student
+    DELETE /sessions/<id>                 unload the session from memory
+
+Streaming responses send "queue" events ({"position"}) while the request
+waits for the rate limiter, "delta" events ({"text"}) for the reply and a
+final "result" event holding the same dictionary as the JSON endpoint, or an
+"error" event if the turn fails after the stream has started. Unexpected
+errors elsewhere are answered with 500 and the connection is closed.
+"""
+
+import asyncio
+import contextlib
+import json
+import re
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from async_teacher import AsyncEnglishTeacher, get_shared_async_client, warm_up_async_connection
+from config import Config
+from conversation_store import get_conversation_store
+import metrics
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+MAX_HEADERS = 100
+
+
+class HTTPError(Exception):
+    """Raised by a handler to answer with an error status and message."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """One parsed HTTP request."""
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip("/") or "/"
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+        self.keep_alive = headers.get("connection", "").lower() != "close"
+
+    def json(self) -> Dict:
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return payload
+
+
+class Session:
+    """A student's teacher plus the lock that keeps their turns in order."""
+
+    def __init__(self, session_id: str, student_id: Optional[str] = None):
+        self.session_id = session_id
+        self.student_id = student_id
+        self.teacher: Optional[AsyncEnglishTeacher] = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    async def get_teacher(self) -> AsyncEnglishTeacher:
+        """Return the session's teacher, loading it from the store on first use; call with lock held."""
+        if self.teacher is None:
+            self.teacher = await asyncio.to_thread(AsyncEnglishTeacher, session_id=self.session_id, student_id=self.student_id)
+        return self.teacher
+
+
+class SessionManager:
+    """Server-side sessions, evicted least recently used first and when idle."""
+
+    def __init__(self, max_sessions: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def get(self, session_id: str, student_id: Optional[str] = None) -> Session:
+        """Return the session, creating an empty one if it is not loaded."""
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise HTTPError(400, "Invalid session id")
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(session_id, student_id)
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        self._evict(keep=session)
+        return session
+
+    def remove(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, keep: Optional[Session] = None):
+        expires = time.monotonic() - self.ttl
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions and session.last_used > expires:
+                break
+            # A session with a turn in flight stays, or its next request would build a second teacher
+            if session is keep or session.lock.locked():
+                continue
+            del self._sessions[session_id]
+
+
+class TeacherServer:
+    """Routes HTTP requests to the sessions' teachers."""
+
+    def __init__(self, sessions: Optional[SessionManager] = None):
+        self.sessions = sessions or SessionManager(Config.API_MAX_SESSIONS, Config.API_SESSION_TTL)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if not await self.dispatch(request, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # The client went away
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request and return whether the connection can be reused."""
+        keep_alive = request.keep_alive
+        try:
+            if request.headers.get("transfer-encoding"):
+                keep_alive = False  # The unread body would be parsed as the next request
+                raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+            status, payload = await self.route(request, writer)
+        except HTTPError as e:
+            status, payload = e.status, {"error": e.message}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception:
+            traceback.print_exc()
+            status, payload, keep_alive = 500, {"error": "Internal server error"}, False
+
+        if payload is None:
+            return False  # An event stream was sent and the connection closed
+        await send_json(writer, status, payload, keep_alive=keep_alive)
+        return keep_alive
+
+    async def route(self, request: Request, writer: asyncio.StreamWriter):
+        """Return (status, payload); payload is None when the handler streamed its own response."""
+        parts = request.path.strip("/").split("/")
+        method = request.method
+
+        if parts == ["health"] and method == "GET":
+            return 200, {"status": "ok", "sessions": len(self.sessions)}
+        if parts == ["metrics"] and method == "GET":
+            return await self._metrics(writer)
+        if parts == ["sessions"] and method == "POST":
+            student_id = request.json().get("student_id")
+            if student_id is not None and (not isinstance(student_id, str) or not 0 < len(student_id) <= 128):
+                raise HTTPError(400, "'student_id' must be a string of 1 to 128 characters")
+            session = self.sessions.get(uuid.uuid4().hex, student_id)
+            if student_id is not None:
+                # Persisted, so the session keeps its student after it is evicted and reloaded
+                await asyncio.to_thread(get_conversation_store().register_session, session.session_id, student_id)
+            return 201, {"session_id": session.session_id}
+
+        if len(parts) < 2 or parts[0] != "sessions":
+            raise HTTPError(404, "Not found")
+
+        session_id = parts[1]
+        action = parts[2] if len(parts) == 3 else None
+        if len(parts) > 3:
+            raise HTTPError(404, "Not found")
+
+        if action is None and method == "DELETE":
+            self.sessions.remove(session_id)
+            return 200, {"session_id": session_id}
+
+        handlers = {
+            ("messages", "POST"): self._message,
+            ("analysis", "POST"): self._analysis,
+            ("summary", "GET"): self._summary,
+            ("history", "GET"): self._history,
+            ("progress", "GET"): self._progress
+        }
+        handler = handlers.get((action, method))
+        if handler is None:
+            allowed = [name for name, _ in handlers if name == action]
+            raise HTTPError(405 if allowed else 404, "Method not allowed" if allowed else "Not found")
+
+        session = self.sessions.get(session_id)
+        async with session.lock:
+            teacher = await session.get_teacher()
+            return await handler(teacher, request, writer)
+
+    async def _message(self, teacher: AsyncEnglishTeacher, request: Request, writer: asyncio.StreamWriter):
+        payload = request.json()
+        message = payload.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "'message' must be a non-empty string")
+        mode, level = get_mode_and_level(payload)
+
+        if not payload.get("stream"):
+            return 200, await teacher.get_teacher_response(message, mode=mode, level=level)
+
+        await send_event_stream_headers(writer)
+
+        def send_queue_position(position):
+            writer.write(format_event("queue", {"position": position}))
+
+        stream = teacher.stream_teacher_response(message, mode=mode, level=level, on_queue=send_queue_position)
+        try:
+            async with contextlib.aclosing(stream.__aiter__()) as deltas:
+                async for delta in deltas:
+                    writer.write(format_event("delta", {"text": delta}))
+                    await writer.drain()
+            writer.write(format_event("result", stream.result))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception:
+            # The headers are already sent, so the failure is reported as the last event
+            traceback.print_exc()
+            writer.write(format_event("error", {"error": "Internal server error"}))
+        await writer.drain()
+        return 200, None
+
+    async def _analysis(self, teacher: AsyncEnglishTeacher, request: Request, writer: asyncio.StreamWriter):
+        payload = request.json()
+        text = payload.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(400, "'text' must be a non-empty string")
+        mode, level = get_mode_and_level(payload)
+        return 200, await teacher._analyze_user_input(text, mode, level)
+
+    async def _summary(self, teacher: AsyncEnglishTeacher, request: Request, writer: asyncio.StreamWriter):
+        return 200, {"summary": await teacher.get_conversation_summary()}
+
+    async def _history(self, teacher: AsyncEnglishTeacher, request: Request, writer: asyncio.StreamWriter):
+        try:
+            page = max(0, int(request.query.get("page", 0)))
+            page_size = min(100, max(1, int(request.query.get("page_size", Config.HISTORY_PAGE_SIZE))))
+        except ValueError:
+            raise HTTPError(400, "'page' and 'page_size' must be integers")
+        exchanges = await asyncio.to_thread(teacher.get_history_page, page, page_size)
+        return 200, {"exchanges": exchanges, "total": teacher.exchange_count()}
+
+    async def _progress(self, teacher: AsyncEnglishTeacher, request: Request, writer: asyncio.StreamWriter):
+        progress, frequent = await asyncio.gather(
+            asyncio.to_thread(teacher.get_progress),
+            asyncio.to_thread(teacher.get_frequent_mistakes)
+        )
+        return 200, {"progress": progress, "frequent_mistakes": frequent}
+
+    async def _metrics(self, writer: asyncio.StreamWriter):
+        body = metrics.registry.to_prometheus().encode("utf-8")
+        writer.write(format_head(200, "text/plain; version=0.0.4; charset=utf-8", len(body), keep_alive=False) + body)
+        await writer.drain()
+        return 200, None
+
+
+def get_mode_and_level(payload: Dict):
+    """Validate the optional mode and level of a request body."""
+    mode = payload.get("mode", "conversation")
+    level = payload.get("level", "intermediate")
+    if mode not in Config.MODES:
+        raise HTTPError(400, f"'mode' must be one of: {', '.join(Config.MODES)}")
+    if level not in Config.LEVELS:
+        raise HTTPError(400, f"'level' must be one of: {', '.join(Config.LEVELS)}")
+    return mode, level
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Read one request from the connection, or return None when the client closed it."""
+    line = await read_line(reader, 414, "Request line too long")
+    if not line.strip():
+        return None
+
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await read_line(reader, 431, "Header line too long")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(431, "Too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > Config.API_MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+async def read_line(reader: asyncio.StreamReader, status: int, message: str) -> bytes:
+    """Read one line, answering with status when it is longer than the reader's limit."""
+    try:
+        return await reader.readline()
+    except ValueError:
+        raise HTTPError(status, message)
+
+
+def format_head(status: int, content_type: str, length: Optional[int] = None, keep_alive: bool = True,
+                extra_headers: Optional[Dict[str, str]] = None) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}"]
+    if length is not None:
+        lines.append(f"Content-Length: {length}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    lines.extend(f"{name}: {value}" for name, value in (extra_headers or {}).items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool = True):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(format_head(status, "application/json", len(body), keep_alive) + body)
+    await writer.drain()
+
+
+async def send_event_stream_headers(writer: asyncio.StreamWriter):
+    # The stream ends when the connection closes, so it is never reused
+    writer.write(format_head(200, "text/event-stream", keep_alive=False, extra_headers={"Cache-Control": "no-cache"}))
+    await writer.drain()
+
+
+def format_event(event: str, data) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def serve(host: str, port: int):
+    """Run the API server until cancelled."""
+    get_shared_async_client()  # Fail fast on a missing API key
+    metrics.start_exporters()
+
+    # Connect on this event loop, so the first request reuses the pooled connection
+    if Config.WARM_UP_CONNECTION:
+        started = time.perf_counter()
+        reachable = await warm_up_async_connection()
+        status = "" if reachable else " (unreachable, connecting on the first request)"
+        print(f"⏱️  API connection: {(time.perf_counter() - started) * 1000:.0f} ms{status}")
+
+    server = TeacherServer()
+    listener = await asyncio.start_server(server.handle_connection, host, port, backlog=Config.API_BACKLOG)
+    print(f"🌐 English Teacher API listening on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(args) -> int:
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except ValueError as e:
+        print(f"❌ Configuration Error: {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\n👋 English Teacher API stopped. Goodbye!")
+    return 0
@@ -1,7 +1,9 @@
 import streamlit as st
-import time
-from english_teacher import EnglishTeacher
+from english_teacher import EnglishTeacher, get_shared_client, response_cache
+from grammar_rules import fast_path_stats
+from semantic_cache import semantic_cache
 from config import Config
+import metrics
 import os
 
 # Page configuration
@@ -47,17 +49,74 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_openai_client():
+    """Return the OpenAI client shared by every browser session."""
+    return get_shared_client()
+
+@st.cache_resource
+def start_metrics_exporters():
+    """Start the Prometheus exporters once per server process."""
+    metrics.start_exporters()
+    return True
+
+@st.fragment
+def display_admin_panel():
+    """Display latency percentiles, token usage and cost per LLM call kind."""
+    with st.expander("🛠️ Admin: Performance", expanded=False):
+        group_by = st.selectbox("Group by", options=["call", "mode", "level", "model"])
+        rows = metrics.registry.summary(group_by=(group_by,))
+        if not rows:
+            st.info("No LLM calls recorded yet.")
+            return
+        
+        st.dataframe([{
+            group_by.title(): row[group_by],
+            "Requests": row["requests"],
+            "Errors": row["errors"],
+            "Cache hits": row["cache_hits"],
+            "Fallbacks": row["fallbacks"],
+            "Collapsed": row["collapsed"],
+            "p50 (s)": round(row["p50_seconds"], 3),
+            "p95 (s)": round(row["p95_seconds"], 3),
+            "p99 (s)": round(row["p99_seconds"], 3),
+            "p50 TTFT (s)": round(row["p50_ttft_seconds"], 3),
+            "Prompt tokens": row["prompt_tokens"],
+            "Cached prompt tokens": row["cached_tokens"],
+            "Completion tokens": row["completion_tokens"],
+            "Cost ($)": round(row["cost"], 4)
+        } for row in rows], use_container_width=True, hide_index=True)
+        
+        cache_stats = response_cache.stats()
+        st.caption(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                   f"({cache_stats['hit_rate']:.0%} hit rate)")
+        semantic_stats = semantic_cache.stats()
+        st.caption(f"Near-duplicate cache: {semantic_stats['hits']} hits, {semantic_stats['misses']} misses "
+                   f"({semantic_stats['hit_rate']:.0%} hit rate, {semantic_stats['entries']} entries)")
+        fast_path = fast_path_stats.as_dict()
+        st.caption(f"Local grammar rules: {fast_path['calls_shrunk']} of {fast_path['checked']} analysis calls shrunk")
+
 def initialize_session_state():
     """Initialize session state variables."""
+    start_metrics_exporters()
+    
     if 'teacher' not in st.session_state:
         try:
-            st.session_state.teacher = EnglishTeacher()
+            # The ids in the URL let a student resume after a restart and keep
+            # their progress across cleared conversations
+            st.session_state.teacher = EnglishTeacher(
+                client=get_openai_client(),
+                session_id=st.query_params.get("session"),
+                student_id=st.query_params.get("student")
+            )
         except ValueError as e:
             st.error(f"Configuration Error: {e}")
             st.stop()
+        st.query_params["session"] = st.session_state.teacher.session_id
+        st.query_params["student"] = st.session_state.teacher.student_id
     
-    if 'conversation_history' not in st.session_state:
-        st.session_state.conversation_history = []
+    if 'history_pages' not in st.session_state:
+        st.session_state.history_pages = 1
     
     if 'current_mode' not in st.session_state:
         st.session_state.current_mode = "conversation"
@@ -65,20 +124,138 @@ def initialize_session_state():
     if 'current_level' not in st.session_state:
         st.session_state.current_level = "intermediate"
 
+@st.fragment
 def display_conversation_history():
-    """Display the conversation history."""
-    if st.session_state.conversation_history:
-        st.markdown("### 💬 Conversation History")
+    """Display the latest pages of the conversation history, loading older pages on request.
+    
+    The exchange count is read on every run, since chat turns add exchanges
+    without rerunning this fragment.
+    """
+    total = st.session_state.teacher.exchange_count()
+    if not total:
+        return
+    
+    st.markdown("---")
+    st.markdown("### 💬 Conversation History")
+    
+    page_size = Config.HISTORY_PAGE_SIZE
+    exchanges = []
+    for page in range(st.session_state.history_pages):
+        exchanges.extend(st.session_state.teacher.get_history_page(page, page_size))
+    
+    for offset, exchange in enumerate(exchanges):
+        with st.expander(f"Exchange {total - offset} - {exchange['mode'].title()}", expanded=False):
+            st.markdown(f"**You:** {exchange['user_input']}")
+            st.markdown(f"**Teacher:** {exchange['response']}")
+            
+            if exchange.get('analysis', {}).get('feedback'):
+                st.markdown("**Analysis:**")
+                st.markdown(f"<div class='analysis-box'>{exchange['analysis']['feedback']}</div>", 
+                          unsafe_allow_html=True)
+    
+    if len(exchanges) < total:
+        if st.button(f"⬇️ Show older exchanges ({total - len(exchanges)} more)"):
+            st.session_state.history_pages += 1
+            st.rerun(scope="fragment")
+
+@st.fragment
+def chat_area(mode, level):
+    """Render the input area, the teacher's answer and the progress panel.
+    
+    Sending a message reruns only this fragment, not the sidebar, the CSS or
+    the conversation history.
+    """
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.markdown("### 💭 Start Learning!")
+        
+        # Display current mode and level
+        st.markdown(f"""
+        <div class="mode-selector">
+            <strong>Current Mode:</strong> {Config.MODES[mode]}<br>
+            <strong>Your Level:</strong> {Config.LEVELS[level]}
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # User input
+        user_input = st.text_area(
+            "Type your message here:",
+            placeholder="Ask a question, start a conversation, or share something you'd like me to help you with!",
+            height=100,
+            key="user_input"
+        )
+        
+        # Submit button
+        col_btn1, col_btn2, col_btn3 = st.columns([1, 1, 2])
         
-        for i, exchange in enumerate(st.session_state.conversation_history):
-            with st.expander(f"Exchange {i+1} - {exchange['mode'].title()}", expanded=False):
-                st.markdown(f"**You:** {exchange['user_input']}")
-                st.markdown(f"**Teacher:** {exchange['response']}")
+        with col_btn1:
+            submit_button = st.button("🚀 Send", type="primary", use_container_width=True)
+        
+        with col_btn2:
+            if st.button("💡 Get Example", use_container_width=True):
+                st.session_state.example_text = Config.EXAMPLES[mode]
+                st.rerun(scope="fragment")
+        
+        # Display example if available
+        if 'example_text' in st.session_state:
+            st.info(f"💡 Example: {st.session_state.example_text}")
+            if st.button("Use Example"):
+                user_input = st.session_state.example_text
+                del st.session_state.example_text
+                submit_button = True
+        
+        # Process user input
+        if submit_button and user_input.strip():
+            try:
+                # Tell the student where they are while the request waits for the rate limiter
+                queue_notice = st.empty()
+                def show_queue_position(position):
+                    queue_notice.info(f"⏳ Lots of students are asking questions right now. You are number {position} in line...")
                 
-                if exchange.get('analysis', {}).get('feedback'):
+                # Stream the teacher's response as it is generated
+                stream = st.session_state.teacher.stream_teacher_response(
+                    user_input, 
+                    mode=st.session_state.current_mode,
+                    level=st.session_state.current_level,
+                    on_queue=show_queue_position
+                )
+                st.markdown("**Teacher:**")
+                st.write_stream(stream)
+                queue_notice.empty()
+                result = stream.result
+                
+                # The teacher stores the exchange once the stream is finished
+                if result is not None and result['analysis'].get('feedback'):
                     st.markdown("**Analysis:**")
-                    st.markdown(f"<div class='analysis-box'>{exchange['analysis']['feedback']}</div>", 
+                    st.markdown(f"<div class='analysis-box'>{result['analysis']['feedback']}</div>", 
                               unsafe_allow_html=True)
+                
+            except Exception as e:
+                st.error(f"An error occurred: {str(e)}")
+    
+    with col2:
+        st.markdown("### 📈 Learning Tips")
+        
+        for tip in Config.LEARNING_TIPS[mode]:
+            st.markdown(tip)
+        
+        st.markdown("---")
+        st.markdown("### 🏆 Progress")
+        st.metric("Conversations", st.session_state.teacher.exchange_count())
+        
+        # Counters are kept up to date per student, so this reads a few index entries
+        progress = st.session_state.teacher.get_progress()
+        if progress["exchanges"]:
+            st.markdown(f"**All sessions:** {progress['exchanges']} exchanges, {progress['mistakes']} corrections")
+            for mode_name, count in progress["by_mode"].items():
+                st.markdown(f"• {Config.MODES.get(mode_name, mode_name)}: {count}")
+        
+        frequent_mistakes = st.session_state.teacher.get_frequent_mistakes(limit=3)
+        if frequent_mistakes:
+            st.markdown("**Your most frequent mistakes:**")
+            for mistake in frequent_mistakes:
+                st.markdown(f"• {mistake['original']} → {mistake['correction']} ({mistake['category']}, ×{mistake['count']})")
 
 def main():
     # Initialize session state
@@ -116,13 +293,7 @@ def main():
         
         # Mode descriptions
         st.markdown("### 📖 Mode Descriptions")
-        mode_descriptions = {
-            "conversation": "Practice natural conversation with gentle corrections",
-            "grammar": "Focus on grammar corrections and explanations",
-            "vocabulary": "Improve your vocabulary with better word choices",
-            "writing": "Get feedback on your writing style and structure"
-        }
-        st.info(mode_descriptions[mode])
+        st.info(Config.MODE_DESCRIPTIONS[mode])
         
         st.markdown("---")
         
@@ -130,140 +301,29 @@ def main():
         st.markdown("### 🎛️ Session Controls")
         if st.button("🗑️ Clear Conversation", help="Clear the current conversation history"):
             st.session_state.teacher.clear_conversation()
-            st.session_state.conversation_history = []
+            st.query_params["session"] = st.session_state.teacher.session_id
+            st.session_state.history_pages = 1
             st.success("Conversation cleared!")
             st.rerun()
         
         if st.button("📊 Get Session Summary", help="Get a summary of your learning session"):
-            if st.session_state.conversation_history:
+            if st.session_state.teacher.exchange_count():
                 with st.spinner("Generating summary..."):
                     summary = st.session_state.teacher.get_conversation_summary()
                 st.markdown("### Session Summary")
                 st.write(summary)
             else:
                 st.info("No conversation history to summarize.")
-    
-    # Main content area
-    col1, col2 = st.columns([2, 1])
-    
-    with col1:
-        st.markdown("### 💭 Start Learning!")
         
-        # Display current mode and level
-        st.markdown(f"""
-        <div class="mode-selector">
-            <strong>Current Mode:</strong> {Config.MODES[mode]}<br>
-            <strong>Your Level:</strong> {Config.LEVELS[level]}
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # User input
-        user_input = st.text_area(
-            "Type your message here:",
-            placeholder="Ask a question, start a conversation, or share something you'd like me to help you with!",
-            height=100,
-            key="user_input"
-        )
-        
-        # Submit button
-        col_btn1, col_btn2, col_btn3 = st.columns([1, 1, 2])
-        
-        with col_btn1:
-            submit_button = st.button("🚀 Send", type="primary", use_container_width=True)
-        
-        with col_btn2:
-            if st.button("💡 Get Example", use_container_width=True):
-                examples = {
-                    "conversation": "Hi! I'm learning English. Can we talk about your favorite hobby?",
-                    "grammar": "I have went to the store yesterday and buyed some apples.",
-                    "vocabulary": "The weather is very good today. I feel happy.",
-                    "writing": "I want to write a letter to my friend about my vacation."
-                }
-                st.session_state.example_text = examples[mode]
-                st.rerun()
-        
-        # Display example if available
-        if 'example_text' in st.session_state:
-            st.info(f"💡 Example: {st.session_state.example_text}")
-            if st.button("Use Example"):
-                user_input = st.session_state.example_text
-                del st.session_state.example_text
-                submit_button = True
-        
-        # Process user input
-        if submit_button and user_input.strip():
-            with st.spinner("Teacher is thinking..."):
-                try:
-                    # Get teacher response
-                    result = st.session_state.teacher.get_teacher_response(
-                        user_input, 
-                        mode=st.session_state.current_mode,
-                        level=st.session_state.current_level
-                    )
-                    
-                    # Store in conversation history
-                    st.session_state.conversation_history.append({
-                        'user_input': user_input,
-                        'response': result['response'],
-                        'analysis': result['analysis'],
-                        'mode': result['mode'],
-                        'timestamp': time.time()
-                    })
-                    
-                    
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
+        if Config.ADMIN_PANEL:
+            st.markdown("---")
+            display_admin_panel()
     
-    with col2:
-        st.markdown("### 📈 Learning Tips")
-        
-        tips = {
-            "conversation": [
-                "💬 Don't worry about making mistakes - they're part of learning!",
-                "🔄 Try to use new vocabulary you've learned",
-                "❓ Ask questions to keep the conversation flowing",
-                "🎯 Focus on expressing your ideas clearly"
-            ],
-            "grammar": [
-                "📝 Pay attention to verb tenses",
-                "🔍 Look for patterns in your mistakes",
-                "📚 Practice with similar sentences",
-                "✅ Review corrections carefully"
-            ],
-            "vocabulary": [
-                "📖 Learn words in context",
-                "🔄 Use new words in different sentences",
-                "📝 Keep a vocabulary notebook",
-                "🎯 Focus on words you use often"
-            ],
-            "writing": [
-                "✍️ Plan your ideas before writing",
-                "📝 Use varied sentence structures",
-                "🔍 Check for clarity and flow",
-                "📚 Read your writing aloud"
-            ]
-        }
-        
-        for tip in tips[mode]:
-            st.markdown(tip)
-        
-        st.markdown("---")
-        st.markdown("### 🏆 Progress")
-        st.metric("Conversations", len(st.session_state.conversation_history))
-        
-        if st.session_state.conversation_history:
-            recent_modes = [ex['mode'] for ex in st.session_state.conversation_history[-5:]]
-            mode_counts = {mode: recent_modes.count(mode) for mode in set(recent_modes)}
-            st.markdown("**Recent Activity:**")
-            for mode_name, count in mode_counts.items():
-                st.markdown(f"• {Config.MODES[mode_name]}: {count}")
+    # Main content area; a chat turn only reruns this fragment
+    chat_area(mode, level)
     
     # Display conversation history
-    if st.session_state.conversation_history:
-        st.markdown("---")
-        display_conversation_history()
+    display_conversation_history()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,521 @@
+"""
+asyncio version of the English teacher for the HTTP API server.
+
+AsyncEnglishTeacher reuses the prompt building, history, caching and
+chunking logic of EnglishTeacher and replaces every network call with a
+coroutine on openai.AsyncOpenAI, so one event loop can serve many students
+at once without a thread per request.
+"""
+
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+
+from config import Config
+from conversation_store import ConversationStore
+from mistake_index import MistakeIndex
+from english_teacher import (
+    FALLBACK_ERRORS, RETRYABLE_ERRORS, EnglishTeacher, QueueFullError, RateLimiter, SingleFlight,
+    estimate_message_tokens, get_retry_delay, split_into_chunks
+)
+from metrics import cached_prompt_tokens, registry as metrics
+
+
+_shared_async_client = None
+_shared_async_client_lock = threading.Lock()
+
+
+def get_shared_async_client() -> openai.AsyncOpenAI:
+    """Return the process-wide async OpenAI client, creating it on first use."""
+    global _shared_async_client
+
+    if _shared_async_client is None:
+        with _shared_async_client_lock:
+            if _shared_async_client is None:
+                if not Config.OPENAI_API_KEY:
+                    raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY in your environment variables.")
+
+                try:
+                    http_client = httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY
+                        ),
+                        timeout=Config.OPENAI_TIMEOUT
+                    )
+                    # Retries are handled by AsyncEnglishTeacher._chat_completion
+                    _shared_async_client = openai.AsyncOpenAI(
+                        api_key=Config.OPENAI_API_KEY,
+                        base_url=Config.OPENAI_BASE_URL or None,
+                        timeout=Config.OPENAI_TIMEOUT,
+                        max_retries=0,
+                        http_client=http_client
+                    )
+                except Exception as e:
+                    raise ValueError(f"Failed to initialize OpenAI client: {str(e)}. Please check your API key and internet connection.")
+
+    return _shared_async_client
+
+
+async def warm_up_async_connection(client: Optional[openai.AsyncOpenAI] = None) -> bool:
+    """Open a pooled connection to the API base URL; see english_teacher.warm_up_connection."""
+    try:
+        await (client or get_shared_async_client()).with_options(timeout=Config.WARM_UP_TIMEOUT).models.list()
+    except openai.APIStatusError:
+        pass
+    except openai.APIError:
+        return False
+    return True
+
+
+class AsyncRateLimiter(RateLimiter):
+    """RateLimiter for coroutines running on one event loop.
+
+    Waiting callers yield to the loop instead of blocking a thread. A caller
+    that is cancelled while queued gives up its place.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float = 0, max_queue: int = 0):
+        super().__init__(requests_per_minute, tokens_per_minute, max_queue)
+        self._condition = asyncio.Condition()
+
+    async def acquire(self, tokens: int = 0, on_wait=None):
+        """Wait until the caller may send a request costing about tokens tokens."""
+        async with self._condition:
+            if self.max_queue and len(self._waiters) >= self.max_queue:
+                raise QueueFullError("The teacher is helping a lot of students right now. Please try again in a moment")
+
+            ticket = object()
+            self._waiters.append(ticket)
+
+        last_position = None
+        try:
+            while True:
+                async with self._condition:
+                    self._refill()
+                    is_next = self._waiters[0] is ticket
+                    if is_next and self._has_capacity():
+                        if self.requests_per_second:
+                            self._requests -= 1
+                        if self.tokens_per_second:
+                            self._tokens -= tokens
+                        return
+
+                    position = self._waiters.index(ticket) + 1
+                    if on_wait is None or position == last_position:
+                        try:
+                            await asyncio.wait_for(self._condition.wait(), self._time_until_capacity() if is_next else 1.0)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+
+                # Like the thread version, the callback runs without the lock held
+                on_wait(position)
+                last_position = position
+        finally:
+            async with self._condition:
+                self._waiters.remove(ticket)
+                self._condition.notify_all()
+
+    def queue_length(self) -> int:
+        """Return how many callers are waiting for admission."""
+        return len(self._waiters)
+
+
+# Process-wide limiter shared by every async teacher on the event loop
+async_request_limiter = AsyncRateLimiter(
+    requests_per_minute=Config.RATE_LIMIT_RPM,
+    tokens_per_minute=Config.RATE_LIMIT_TPM,
+    max_queue=Config.RATE_LIMIT_MAX_QUEUE
+)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop.
+
+    The call runs in its own task. A cancelled waiter only stops waiting;
+    the call is cancelled once no caller is waiting for it any more.
+    """
+
+    def __init__(self):
+        self.collapsed = 0
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+
+    async def do(self, key: str, call) -> Tuple[object, bool]:
+        """Await call() unless an identical call is in flight, and share its outcome; see SingleFlight.do."""
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            task = self._calls[key] = asyncio.ensure_future(call())
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.collapsed += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task), leader
+        except asyncio.CancelledError:
+            # The key may already belong to a newer call once this one finished
+            if self._calls.get(key) is task and self._waiters[key] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every waiter was cancelled
+
+
+# Process-wide single-flight layer shared by every async teacher on the event loop
+async_request_flight = AsyncSingleFlight()
+
+
+class AsyncEnglishTeacher(EnglishTeacher):
+    """EnglishTeacher whose requests are coroutines on openai.AsyncOpenAI.
+
+    The constructor reads the session from the conversation store, so build
+    it off the event loop (for example with asyncio.to_thread).
+    """
+
+    def __init__(self, structured: Optional[bool] = None, client: Optional[openai.AsyncOpenAI] = None,
+                 limiter: Optional[AsyncRateLimiter] = None, session_id: Optional[str] = None,
+                 store: Optional[ConversationStore] = None, student_id: Optional[str] = None,
+                 mistakes: Optional[MistakeIndex] = None):
+        super().__init__(
+            structured=structured,
+            client=client or get_shared_async_client(),
+            limiter=limiter or async_request_limiter,
+            session_id=session_id,
+            store=store,
+            student_id=student_id,
+            mistakes=mistakes
+        )
+        self._summary_task: Optional[asyncio.Task] = None
+
+    async def get_teacher_response(self, user_input: str, mode: str = "conversation", level: str = "intermediate") -> Dict:
+        """
+        Get a response from the English teacher based on user input and learning mode.
+
+        Args:
+            user_input: The student's input text
+            mode: Learning mode (conversation, grammar, vocabulary, writing)
+            level: Student's English level (beginner, intermediate, advanced)
+
+        Returns:
+            Dictionary containing the teacher's response and analysis
+        """
+
+        if self.structured:
+            return await self._get_structured_response(user_input, mode, level)
+
+        messages = self._build_messages(user_input, mode, level)
+
+        # Send the reply and the analysis requests at the same time
+        analysis_task = asyncio.create_task(self._analyze_user_input(user_input, mode, level))
+
+        try:
+            teacher_response = await asyncio.wait_for(self._create_reply(messages, mode, level), Config.REPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            analysis_task.cancel()
+            return self._error_result(f"no reply within {Config.REPLY_TIMEOUT:g} seconds", mode, level)
+        except Exception as e:
+            analysis_task.cancel()
+            return self._error_result(str(e), mode, level)
+        except asyncio.CancelledError:
+            analysis_task.cancel()
+            raise
+
+        return await self._finish_turn(user_input, teacher_response, analysis_task, mode, level)
+
+    def stream_teacher_response(self, user_input: str, mode: str = "conversation", level: str = "intermediate",
+                                on_queue=None) -> "AsyncTeacherResponseStream":
+        """
+        Stream the teacher's response token by token.
+
+        Returns:
+            An async iterable of text deltas. Once it is exhausted, its
+            ``result`` attribute holds the same dictionary get_teacher_response returns.
+        """
+        return AsyncTeacherResponseStream(self, user_input, mode, level, on_queue=on_queue)
+
+    async def _finish_turn(self, user_input: str, teacher_response: str, analysis_task: asyncio.Task,
+                           mode: str, level: str) -> Dict:
+        """Wait for the analysis, record the exchange and build the result."""
+
+        # The analysis is optional: a failure or timeout never hides the reply
+        try:
+            analysis = await asyncio.wait_for(analysis_task, Config.ANALYSIS_TIMEOUT)
+        except asyncio.TimeoutError:
+            analysis = {"error": f"Analysis failed: no result within {Config.ANALYSIS_TIMEOUT:g} seconds"}
+
+        return await self._record_turn(user_input, teacher_response, analysis, mode, level)
+
+    async def _record_turn(self, user_input: str, teacher_response: str, analysis: Dict, mode: str, level: str) -> Dict:
+        """Add the exchange to the conversation history and build the result."""
+        await asyncio.to_thread(self._store_exchange, user_input, teacher_response, analysis, mode, level)
+        self._remember_exchange(user_input, teacher_response)
+        return self._turn_result(teacher_response, analysis, mode, level)
+
+    async def _get_structured_response(self, user_input: str, mode: str, level: str, on_queue=None) -> Dict:
+        """Get the reply and the analysis from a single JSON-mode request."""
+        messages = self._build_structured_messages(user_input, mode, level)
+
+        try:
+            response = await self._chat_completion(
+                ("reply", mode, level),
+                Config.get_models("reply", mode, level, len(user_input)),
+                on_queue=on_queue,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=800,
+                timeout=Config.REPLY_TIMEOUT,
+                response_format={"type": "json_object"}
+            )
+        except Exception as e:
+            return self._error_result(str(e), mode, level)
+
+        teacher_response, analysis = self._parse_structured_turn(response.choices[0].message.content)
+        return await self._record_turn(user_input, teacher_response, analysis, mode, level)
+
+    async def _chat_completion(self, labels: tuple, models: tuple, on_queue=None, **kwargs):
+        """Send a chat completion request through the rate limiter with retries; see EnglishTeacher._chat_completion."""
+        if kwargs.get("stream"):
+            return (await self._send_completion(labels, models, on_queue, kwargs))[0]
+
+        started = time.perf_counter()
+        (response, model), leader = await async_request_flight.do(
+            SingleFlight.make_key(models, kwargs),
+            lambda: self._send_completion(labels, models, on_queue, kwargs)
+        )
+        if not leader:
+            self.last_models[labels[0]] = model
+            metrics.record(*labels, model, time.perf_counter() - started, collapsed=True)
+        return response
+
+    async def _send_completion(self, labels: tuple, models: tuple, on_queue, kwargs: Dict) -> Tuple[object, str]:
+        """Make the upstream request for _chat_completion and return it with the model that served it."""
+        tokens = sum(estimate_message_tokens(message) for message in kwargs["messages"]) + kwargs.get("max_tokens", 0)
+        started = time.perf_counter()
+        model_index = 0
+
+        for attempt in range(Config.RETRY_ATTEMPTS + 1):
+            model = models[model_index]
+            try:
+                await self.limiter.acquire(tokens, on_wait=on_queue)
+                response = await self.client.chat.completions.create(model=model, **kwargs)
+                break
+            except FALLBACK_ERRORS as e:
+                can_fall_back = model_index + 1 < len(models)
+                if attempt == Config.RETRY_ATTEMPTS or not (can_fall_back or isinstance(e, RETRYABLE_ERRORS)):
+                    metrics.record(*labels, model, time.perf_counter() - started, error=True)
+                    raise
+                if can_fall_back:
+                    # The next model has its own rate limits, so try it right away
+                    model_index += 1
+                else:
+                    await asyncio.sleep(get_retry_delay(attempt, e))
+            except Exception:
+                metrics.record(*labels, model, time.perf_counter() - started, error=True)
+                raise
+
+        self.last_models[labels[0]] = model
+        if kwargs.get("stream"):
+            return self._instrument_stream(response, labels, model, started, fallback=model_index > 0), model
+
+        seconds = time.perf_counter() - started
+        usage = response.usage
+        metrics.record(
+            *labels, model, seconds,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=cached_prompt_tokens(usage),
+            fallback=model_index > 0
+        )
+        return response, model
+
+    async def _instrument_stream(self, stream, labels: tuple, model: str, started: float,
+                                 fallback: bool = False) -> AsyncIterator:
+        """Pass stream chunks through, recording time to first token and usage when it ends."""
+        ttft = None
+        usage = None
+        error = False
+        try:
+            async for chunk in stream:
+                if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+                    ttft = time.perf_counter() - started
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                yield chunk
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.record(
+                *labels, model, time.perf_counter() - started, ttft=ttft,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0,
+                cached_tokens=cached_prompt_tokens(usage),
+                error=error, fallback=fallback
+            )
+
+    async def _create_reply(self, messages: List[Dict], mode: str, level: str) -> str:
+        """Request the teacher's reply for an already built message list."""
+        response = await self._chat_completion(
+            ("reply", mode, level),
+            Config.get_models("reply", mode, level, len(messages[-1]["content"])),
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            timeout=Config.REPLY_TIMEOUT
+        )
+
+        return response.choices[0].message.content
+
+    async def _stream_reply(self, messages: List[Dict], mode: str, level: str, on_queue=None) -> AsyncIterator[str]:
+        """Request the teacher's reply with streaming and yield its text deltas."""
+        stream = await self._chat_completion(
+            ("reply", mode, level),
+            Config.get_models("reply", mode, level, len(messages[-1]["content"])),
+            on_queue=on_queue,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            timeout=Config.REPLY_TIMEOUT,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _analyze_user_input(self, user_input: str, mode: str, level: str = "intermediate",
+                                  use_cache: bool = True) -> Dict:
+        """Analyze user input for specific feedback based on mode; see EnglishTeacher._analyze_user_input."""
+
+        if mode in Config.CHUNKED_ANALYSIS_MODES and len(user_input) > Config.CHUNK_MAX_CHARS:
+            return await self._analyze_in_chunks(user_input, mode, level, use_cache)
+
+        return await self._analyze_text(user_input, mode, level, use_cache)
+
+    async def _analyze_text(self, user_input: str, mode: str, level: str, use_cache: bool) -> Dict:
+        """Analyze user input with at most one request; see EnglishTeacher._analyze_text."""
+        # The cache lookups and writes hit SQLite and numpy, so they run off the event loop
+        plan = await asyncio.to_thread(self._plan_analysis, user_input, mode, level, use_cache)
+        if "result" in plan:
+            return plan["result"]
+
+        try:
+            response = await self._chat_completion(("analysis", mode, level), plan["models"], **plan["request"])
+        except Exception as e:
+            return self._analysis_failed(plan, e)
+
+        return await asyncio.to_thread(self._finish_analysis, plan, response.choices[0].message.content)
+
+    async def _analyze_in_chunks(self, user_input: str, mode: str, level: str, use_cache: bool) -> Dict:
+        """Analyze a long text as concurrent chunks and merge the feedback in order."""
+        spans = split_into_chunks(user_input, Config.CHUNK_MAX_CHARS)
+        previous = self._previous_revision()
+        pending = self._chunks_to_analyze(user_input, spans, previous)
+
+        results = await asyncio.gather(*(self._analyze_chunk(chunk, mode, level, use_cache) for chunk in pending))
+        return self._merge_chunks(user_input, spans, dict(zip(pending, results)), previous)
+
+    async def _analyze_chunk(self, chunk: str, mode: str, level: str, use_cache: bool) -> Dict:
+        try:
+            return await asyncio.wait_for(self._analyze_text(chunk, mode, level, use_cache), Config.ANALYSIS_TIMEOUT)
+        except asyncio.TimeoutError:
+            return {"error": f"Analysis failed: no result within {Config.ANALYSIS_TIMEOUT:g} seconds"}
+
+    async def get_conversation_summary(self) -> str:
+        """Get a summary of the current conversation session; see EnglishTeacher.get_conversation_summary."""
+        if not self._message_count:
+            return "No conversation history available."
+
+        if self.summary:
+            self._schedule_summary_update(force=True)
+            return self.summary
+
+        try:
+            await self._update_summary()
+        except Exception as e:
+            return f"Could not generate summary: {str(e)}"
+
+        return self.summary
+
+    def _schedule_summary_update(self, force: bool = False):
+        """Fold new exchanges into the rolling summary in a background task."""
+        with self._summary_lock:
+            if not self._summary_due(force):
+                return
+            if self._summary_task is not None and not self._summary_task.done():
+                return
+            self._summary_task = asyncio.create_task(self._update_summary())
+            # Like the thread pool version, a failed background update is simply retried later
+            self._summary_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _update_summary(self):
+        """Update the summary from the previous summary plus the exchanges it does not cover yet."""
+        update = self._plan_summary_update()
+        if update is None:
+            return
+
+        response = await self._chat_completion(("summary", "session", "session"), update["models"], **update["request"])
+        self._apply_summary(update, response.choices[0].message.content)
+
+
+class AsyncTeacherResponseStream:
+    """Async iterable of the teacher's reply deltas for one turn.
+
+    The analysis request starts together with the stream. The conversation
+    history is updated and ``result`` is set only after the last delta.
+    """
+
+    def __init__(self, teacher: AsyncEnglishTeacher, user_input: str, mode: str, level: str, on_queue=None):
+        self.teacher = teacher
+        self.user_input = user_input
+        self.mode = mode
+        self.level = level
+        self.on_queue = on_queue
+        self.result: Optional[Dict] = None
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        teacher = self.teacher
+
+        # Structured output is a single JSON document, so it arrives in one piece
+        if teacher.structured:
+            self.result = await teacher._get_structured_response(self.user_input, self.mode, self.level, on_queue=self.on_queue)
+            yield self.result["response"]
+            return
+
+        messages = teacher._build_messages(self.user_input, self.mode, self.level)
+        analysis_task = asyncio.create_task(teacher._analyze_user_input(self.user_input, self.mode, self.level))
+
+        chunks = []
+        try:
+            async for delta in teacher._stream_reply(messages, self.mode, self.level, on_queue=self.on_queue):
+                chunks.append(delta)
+                yield delta
+        except Exception as e:
+            analysis_task.cancel()
+            self.result = teacher._error_result(str(e), self.mode, self.level)
+            yield ("\n\n" if chunks else "") + self.result["response"]
+            return
+        except BaseException:
+            # The consumer went away (cancelled or closed the stream)
+            analysis_task.cancel()
+            raise
+
+        self.result = await teacher._finish_turn(self.user_input, "".join(chunks), analysis_task, self.mode, self.level)
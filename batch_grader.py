@@ -0,0 +1,144 @@
+"""
+Offline batch grading of homework submissions.
+
+Reads a JSONL file of {"id", "text", "mode", "level"} records, analyzes each
+text with EnglishTeacher through a bounded pool of workers, and appends one
+JSON line per result to the output file as soon as it is ready.
+"""
+
+import json
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, Set
+
+from config import Config
+from english_teacher import EnglishTeacher, RateLimiter
+
+
+def read_completed_ids(output_path: Path) -> Set[str]:
+    """Return the ids that already have a successful result in the output file."""
+    completed = set()
+    if not output_path.exists():
+        return completed
+    
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partial line left by an interrupted run
+            if "error" not in record:
+                completed.add(str(record["id"]))
+    return completed
+
+
+def iter_submissions(input_path: Path, skip_ids: Set[str]) -> Iterator[Dict]:
+    """Stream the submissions from the input file, skipping ids already graded."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": f"line-{line_number}", "invalid": f"Invalid JSON: {e}"}
+                continue
+            if not isinstance(record, dict):
+                yield {"id": f"line-{line_number}", "invalid": "Each line must be a JSON object"}
+                continue
+            if record.get("id") is None:
+                # Without an id, resuming would confuse every id-less submission with the first one
+                record = dict(record, id=f"line-{line_number}")
+            if str(record["id"]) not in skip_ids:
+                yield record
+
+
+def grade_submission(teacher: EnglishTeacher, record: Dict) -> Dict:
+    """Analyze one submission and build its output record."""
+    result = {
+        "id": record.get("id"),
+        "mode": record.get("mode", "grammar"),
+        "level": record.get("level", "intermediate")
+    }
+    
+    if "invalid" in record:
+        result["error"] = record["invalid"]
+        return result
+    if not isinstance(record.get("text"), str) or not record["text"].strip():
+        result["error"] = "Missing text"
+        return result
+    if result["mode"] not in Config.MODES:
+        result["error"] = f"Unknown mode: {result['mode']}"
+        return result
+    
+    result.update(teacher._analyze_user_input(record["text"], result["mode"], result["level"]))
+    return result
+
+
+def run_batch(input_path: str, output_path: str, workers: int = 8, requests_per_minute: float = 500,
+              tokens_per_minute: float = 0, client=None) -> Dict:
+    """
+    Grade every submission in input_path and append the results to output_path.
+    
+    Submissions whose id already has a successful result in output_path are
+    skipped, so an interrupted job can be resumed by running it again. At most
+    2 * workers submissions are held in memory at any time. client defaults
+    to the shared OpenAI client.
+    
+    Returns:
+        Dictionary with the number of graded, failed and skipped submissions
+    """
+    input_path, output_path = Path(input_path), Path(output_path)
+    completed = read_completed_ids(output_path)
+    # Submissions are unrelated texts, so chunk analyses are never reused across them
+    teacher = EnglishTeacher(client=client, limiter=RateLimiter(requests_per_minute, tokens_per_minute),
+                             reuse_revisions=False)
+    stats = {"graded": 0, "failed": 0, "skipped": len(completed)}
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(output_path, "a", encoding="utf-8") as out:
+        pending = set()
+        submitted = {}
+        
+        def drain(return_when):
+            nonlocal pending
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                record = submitted.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"id": record["id"], "mode": record.get("mode", "grammar"),
+                              "level": record.get("level", "intermediate"), "error": f"Grading failed: {e}"}
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                stats["failed" if "error" in result else "graded"] += 1
+        
+        for record in iter_submissions(input_path, completed):
+            if len(pending) >= 2 * workers:
+                drain(FIRST_COMPLETED)
+            future = pool.submit(grade_submission, teacher, record)
+            submitted[future] = record
+            pending.add(future)
+        
+        if pending:
+            drain(ALL_COMPLETED)
+    
+    return stats
+
+
+def main(args) -> int:
+    """Run the batch subcommand with parsed command line arguments."""
+    print(f"📝 Grading {args.input} -> {args.output} ({args.workers} workers, {args.rpm:g} requests/min)")
+    try:
+        stats = run_batch(args.input, args.output, workers=args.workers,
+                          requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    except (OSError, ValueError) as e:
+        print(f"❌ Batch grading failed: {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted. Run the same command again to resume.")
+        return 130
+    
+    print(f"✅ Graded: {stats['graded']}, failed: {stats['failed']}, already done: {stats['skipped']}")
+    return 0 if stats["failed"] == 0 else 2
+
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for the English Teacher Agent.
+
+Starts a local OpenAI-compatible stub server and points EnglishTeacher at it
+through OPENAI_BASE_URL. Then N simulated students each run a number of turns
+through get_teacher_response or, for a share of the turns, through the
+streaming path the UI uses, followed by get_conversation_summary. No real
+API calls are made.
+
+Usage:
+    python benchmark.py --students 50 --turns 5 --latency 0.3
+    python benchmark.py --save-baseline     # record benchmark_baseline.json
+    python benchmark.py                     # compare against the saved baseline
+
+benchmark_baseline.json is committed and was recorded with the default
+arguments; compare runs with the same arguments, and re-record it with
+--save-baseline when a change is expected to move the numbers.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# Latency changes below this many seconds are noise, whatever the relative change
+MIN_REGRESSION_SECONDS = 0.01
+
+SAMPLE_INPUTS = [
+    "Hi! I'm learning English. Can we talk about your favorite hobby?",
+    "I have went to the store yesterday and buyed some apples.",
+    "The weather is very good today. I feel happy.",
+    "I want to write a letter to my friend about my vacation.",
+    "She don't like coffee but she drink tea every morning.",
+    "Yesterday I go to the cinema with my friends and we watched a funny movie.",
+]
+
+
+class StubSettings:
+    """Behaviour of the stub server; shared by all handler threads."""
+
+    def __init__(self, latency=0.2, jitter=0.05, chunk_interval=0.01, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=0.5, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_interval = chunk_interval
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def count_request(self) -> float:
+        """Count a request and return a random number used to inject failures."""
+        with self.lock:
+            self.requests += 1
+            return self.random.random()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal /chat/completions endpoint compatible with the OpenAI client."""
+
+    protocol_version = "HTTP/1.1"
+    settings: StubSettings = None
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            pass  # The client dropped a pooled keep-alive connection
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        settings = self.settings
+        roll = settings.count_request()
+
+        if roll < settings.rate_limit_rate:
+            self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error"}},
+                            headers={"retry-after": f"{settings.retry_after:g}"})
+            return
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            self._send_json(500, {"error": {"message": "Injected server error (stub)", "type": "server_error"}})
+            return
+
+        time.sleep(max(0.0, settings.latency + settings.random.uniform(-settings.jitter, settings.jitter)))
+        content = self._build_content(body)
+        prompt_tokens = sum(len(message.get("content") or "") for message in body.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "total_tokens": prompt_tokens + len(content) // 4}
+
+        if body.get("stream"):
+            self._stream(body, content, usage)
+        else:
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+    def _build_content(self, body) -> str:
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps({"response": "Great job! Let's keep practicing together.",
+                               "feedback": "- 'have went' -> 'went'\n- 'buyed' -> 'bought'"})
+        words = ("Thanks for sharing! Here is some feedback on your sentence. "
+                 "Remember to use the simple past for finished actions in the past.").split()
+        return " ".join(words[:max(5, body.get("max_tokens", 50) // 10)])
+
+    def _stream(self, body, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "stub")}
+        for word in content.split(" "):
+            send_event(json.dumps(dict(base, choices=[{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}])))
+            time.sleep(self.settings.chunk_interval)
+        send_event(json.dumps(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send_event(json.dumps(dict(base, choices=[], usage=usage)))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(settings: StubSettings, port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub server in a daemon thread and return it."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"settings": settings})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+    return server
+
+
+def run_student(teacher, turns: int, think_time: float, stream_ratio: float, seed: int, samples: dict,
+                lock: threading.Lock):
+    """
+    Simulate one student: several turns, then a session summary.
+
+    samples holds the "turn", "stream_ttft" and "summary" latency lists the
+    student appends to; streamed turns count in both "turn" and "stream_ttft".
+    """
+    from config import Config
+
+    rng = random.Random(seed)
+    for _ in range(turns):
+        user_input = rng.choice(SAMPLE_INPUTS)
+        mode = rng.choice(list(Config.MODES))
+        level = rng.choice(list(Config.LEVELS))
+        started = time.perf_counter()
+        ttft = None
+        if rng.random() < stream_ratio:
+            for _delta in teacher.stream_teacher_response(user_input, mode=mode, level=level):
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+        else:
+            teacher.get_teacher_response(user_input, mode=mode, level=level)
+        elapsed = time.perf_counter() - started
+        with lock:
+            samples["turn"].append(elapsed)
+            if ttft is not None:
+                samples["stream_ttft"].append(ttft)
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
+
+    started = time.perf_counter()
+    teacher.get_conversation_summary()
+    with lock:
+        samples["summary"].append(time.perf_counter() - started)
+
+
+def run_benchmark(args) -> dict:
+    """Run the benchmark and return its report."""
+    settings = StubSettings(latency=args.latency, jitter=args.jitter, chunk_interval=args.chunk_interval,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    server = start_stub_server(settings, args.port)
+
+    # Config reads the environment at import time, so set it up before importing the teacher
+    os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("ENGLISH_TEACHER_RATE_LIMIT_RPM", "0")
+    os.environ.setdefault("ENGLISH_TEACHER_RATE_LIMIT_TPM", "0")
+    os.environ.setdefault("ENGLISH_TEACHER_CONVERSATION_DB", ":memory:")
+    if args.no_cache:
+        os.environ["ENGLISH_TEACHER_CACHE_ENABLED"] = "false"
+
+    from english_teacher import EnglishTeacher, get_shared_client
+    from metrics import percentile
+
+    get_shared_client()
+    tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    teachers = [EnglishTeacher() for _ in range(args.students)]
+
+    samples = {"turn": [], "stream_ttft": [], "summary": []}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_student,
+                         args=(teacher, args.turns, args.think_time, args.stream_ratio, args.seed + i, samples, lock))
+        for i, teacher in enumerate(teachers)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # Let background summary updates finish before reading memory and request counts
+    time.sleep(args.latency * 2)
+    memory_per_session = (tracemalloc.get_traced_memory()[0] - memory_before) / max(1, args.students)
+    tracemalloc.stop()
+    server.shutdown()
+
+    turn_latencies = sorted(samples["turn"])
+    ttft_latencies = sorted(samples["stream_ttft"])
+    summary_latencies = sorted(samples["summary"])
+    total_turns = len(turn_latencies)
+    return {
+        "students": args.students,
+        "turns_per_student": args.turns,
+        "stub_latency": args.latency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_turns_per_second": round(total_turns / elapsed, 3) if elapsed else 0.0,
+        "turn_p50_seconds": round(percentile(turn_latencies, 0.5), 4),
+        "turn_p95_seconds": round(percentile(turn_latencies, 0.95), 4),
+        "turn_p99_seconds": round(percentile(turn_latencies, 0.99), 4),
+        "streamed_turns": len(ttft_latencies),
+        "stream_ttft_p50_seconds": round(percentile(ttft_latencies, 0.5), 4),
+        "stream_ttft_p95_seconds": round(percentile(ttft_latencies, 0.95), 4),
+        "summary_p50_seconds": round(percentile(summary_latencies, 0.5), 4),
+        "requests_per_turn": round(settings.requests / total_turns, 3) if total_turns else 0.0,
+        "memory_per_session_kib": round(memory_per_session / 1024, 1),
+    }
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """Return a description of every metric that regressed by more than tolerance."""
+    regressions = []
+    higher_is_worse = ["turn_p50_seconds", "turn_p95_seconds", "turn_p99_seconds", "stream_ttft_p50_seconds",
+                       "stream_ttft_p95_seconds", "summary_p50_seconds", "requests_per_turn", "memory_per_session_kib"]
+    for key in higher_is_worse:
+        slack = MIN_REGRESSION_SECONDS if key.endswith("_seconds") else 0.0
+        if baseline.get(key) and report[key] > baseline[key] * (1 + tolerance) + slack:
+            regressions.append(f"{key}: {baseline[key]} -> {report[key]}")
+    key = "throughput_turns_per_second"
+    if baseline.get(key) and report[key] < baseline[key] * (1 - tolerance):
+        regressions.append(f"{key}: {baseline[key]} -> {report[key]}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the English Teacher Agent against a local stub server")
+    parser.add_argument("--students", type=int, default=20, help="Number of simulated students (default: 20)")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per student (default: 5)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Maximum pause between turns in seconds")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub response latency in seconds (default: 0.2)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Random +/- latency jitter in seconds")
+    parser.add_argument("--chunk-interval", type=float, default=0.01, help="Delay between streamed chunks in seconds")
+    parser.add_argument("--stream-ratio", type=float, default=0.5,
+                        help="Fraction of turns sent through the streaming path, as in the UI (default: 0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--port", type=int, default=0, help="Stub server port (default: any free port)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the response cache")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help=f"Baseline file (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true", help="Save this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed regression before failing (default: 0.15)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    print(f"🏁 Benchmarking {args.students} students x {args.turns} turns (stub latency {args.latency:g}s)...")
+    report = run_benchmark(args)
+
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"💾 Baseline saved to {baseline_path}")
+        return 0
+
+    if baseline_path.exists():
+        regressions = compare_with_baseline(report, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print("❌ Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("✅ No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,120 @@ load_dotenv()
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     
+    # Shared OpenAI client and HTTP connection pool
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+    OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+    
+    # Process-wide rate limits (0 disables a limit) and admission queue size
+    RATE_LIMIT_RPM = float(os.getenv("ENGLISH_TEACHER_RATE_LIMIT_RPM", "3500"))
+    RATE_LIMIT_TPM = float(os.getenv("ENGLISH_TEACHER_RATE_LIMIT_TPM", "90000"))
+    RATE_LIMIT_MAX_QUEUE = int(os.getenv("ENGLISH_TEACHER_RATE_LIMIT_MAX_QUEUE", "200"))
+    
+    # Retries for rate limits, timeouts and server errors (delays in seconds)
+    RETRY_ATTEMPTS = int(os.getenv("ENGLISH_TEACHER_RETRY_ATTEMPTS", "4"))
+    RETRY_BASE_DELAY = float(os.getenv("ENGLISH_TEACHER_RETRY_BASE_DELAY", "0.5"))
+    RETRY_MAX_DELAY = float(os.getenv("ENGLISH_TEACHER_RETRY_MAX_DELAY", "20"))
+    
+    # Instrumentation: latency samples kept per label set and optional exporters
+    METRICS_WINDOW = int(os.getenv("ENGLISH_TEACHER_METRICS_WINDOW", "1000"))
+    METRICS_PORT = int(os.getenv("ENGLISH_TEACHER_METRICS_PORT", "0"))
+    METRICS_HOST = os.getenv("ENGLISH_TEACHER_METRICS_HOST", "127.0.0.1")
+    METRICS_FILE = os.getenv("ENGLISH_TEACHER_METRICS_FILE", "")
+    METRICS_FILE_INTERVAL = float(os.getenv("ENGLISH_TEACHER_METRICS_FILE_INTERVAL", "15"))
+    ADMIN_PANEL = os.getenv("ENGLISH_TEACHER_ADMIN_PANEL", "false").lower() in ("1", "true", "yes")
+    
+    # Price per 1K tokens in USD (input, output), used for cost estimates
+    MODEL_PRICES = {
+        "gpt-3.5-turbo": (0.0005, 0.0015),
+        "gpt-4o-mini": (0.00015, 0.0006),
+        "gpt-4o": (0.0025, 0.01)
+    }
+    
+    # Model routing for the reply, analysis and summary calls. The first route whose
+    # conditions all match is used (a missing condition matches anything; min_chars and
+    # max_chars apply to the student's text). Its models are tried in order: a model that
+    # errors or is rate limited falls back to the next one.
+    DEFAULT_MODEL = os.getenv("ENGLISH_TEACHER_DEFAULT_MODEL", "gpt-3.5-turbo")
+    MODEL_ROUTES = [
+        # High-volume background calls go to the cheapest, lowest-latency model
+        {"call": "analysis", "models": ("gpt-4o-mini", "gpt-3.5-turbo")},
+        {"call": "summary", "models": ("gpt-4o-mini", "gpt-3.5-turbo")},
+        # Critiques of long essays keep the stronger model
+        {"call": "reply", "modes": ("writing",), "min_chars": 800, "models": ("gpt-4o", "gpt-4o-mini")},
+        # Every other reply, from short conversational turns to medium-length texts
+        {"call": "reply", "models": ("gpt-4o-mini", "gpt-3.5-turbo")}
+    ]
+    
+    # Concurrency and per-request timeouts (seconds)
+    MAX_WORKERS = int(os.getenv("ENGLISH_TEACHER_MAX_WORKERS", "32"))
+    REPLY_TIMEOUT = float(os.getenv("ENGLISH_TEACHER_REPLY_TIMEOUT", "30"))
+    ANALYSIS_TIMEOUT = float(os.getenv("ENGLISH_TEACHER_ANALYSIS_TIMEOUT", "20"))
+    
+    # Opt-in: one JSON-mode request returns both the reply and the analysis
+    STRUCTURED_RESPONSE = os.getenv("ENGLISH_TEACHER_STRUCTURED_RESPONSE", "false").lower() in ("1", "true", "yes")
+    
+    # Response cache for stateless requests (analysis); CACHE_PATH enables the on-disk tier
+    CACHE_ENABLED = os.getenv("ENGLISH_TEACHER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    CACHE_MAX_ENTRIES = int(os.getenv("ENGLISH_TEACHER_CACHE_MAX_ENTRIES", "1024"))
+    CACHE_TTL = float(os.getenv("ENGLISH_TEACHER_CACHE_TTL", "86400"))
+    CACHE_PATH = os.getenv("ENGLISH_TEACHER_CACHE_PATH", "")
+    
+    # Near-duplicate cache for analyses; modes without a similarity threshold are not served from it
+    SEMANTIC_CACHE_ENABLED = os.getenv("ENGLISH_TEACHER_SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("ENGLISH_TEACHER_SEMANTIC_CACHE_MAX_ENTRIES", "4096"))
+    SEMANTIC_CACHE_DIM = int(os.getenv("ENGLISH_TEACHER_SEMANTIC_CACHE_DIM", "512"))
+    SEMANTIC_CACHE_THRESHOLDS = {
+        "conversation": 0.85,
+        "grammar": 0.8,
+        "vocabulary": 0.85
+    }
+    
+    # Local rule-based grammar checker in front of the analysis request
+    FAST_GRAMMAR_CHECK = os.getenv("ENGLISH_TEACHER_FAST_GRAMMAR_CHECK", "true").lower() in ("1", "true", "yes")
+    FAST_GRAMMAR_MODES = ("grammar",)
+    FAST_GRAMMAR_SHRUNK_MAX_TOKENS = 150
+    
+    # Long submissions in these modes are analyzed as concurrent chunks of at most CHUNK_MAX_CHARS
+    CHUNKED_ANALYSIS_MODES = ("writing",)
+    CHUNK_MAX_CHARS = int(os.getenv("ENGLISH_TEACHER_CHUNK_MAX_CHARS", "1200"))
+    
+    # Prompt token budget for the teacher's reply (system prompt + history + input)
+    CONTEXT_TOKEN_BUDGETS = {
+        "conversation": 1500,
+        "grammar": 1000,
+        "vocabulary": 1000,
+        "writing": 2500
+    }
+    CONTEXT_LEVEL_SCALE = {
+        "beginner": 0.75,
+        "intermediate": 1.0,
+        "advanced": 1.25
+    }
+    
+    # Conversation store; exchanges kept in memory for the prompt context window
+    CONVERSATION_DB_PATH = os.getenv("ENGLISH_TEACHER_CONVERSATION_DB", ".cache/conversations.sqlite3")
+    HISTORY_WINDOW_EXCHANGES = int(os.getenv("ENGLISH_TEACHER_HISTORY_WINDOW_EXCHANGES", "10"))
+    HISTORY_PAGE_SIZE = int(os.getenv("ENGLISH_TEACHER_HISTORY_PAGE_SIZE", "10"))
+    
+    # Launcher warm-up before the app accepts traffic
+    WARM_UP_CONNECTION = os.getenv("ENGLISH_TEACHER_WARM_UP_CONNECTION", "true").lower() in ("1", "true", "yes")
+    WARM_UP_CACHE = os.getenv("ENGLISH_TEACHER_WARM_UP_CACHE", "true").lower() in ("1", "true", "yes")
+    WARM_UP_TIMEOUT = float(os.getenv("ENGLISH_TEACHER_WARM_UP_TIMEOUT", "5"))
+    
+    # Number of new exchanges folded into the rolling session summary at once
+    SUMMARY_EVERY_TURNS = int(os.getenv("ENGLISH_TEACHER_SUMMARY_EVERY_TURNS", "3"))
+    
+    # HTTP API server (python run.py serve); idle sessions are unloaded after API_SESSION_TTL seconds
+    API_HOST = os.getenv("ENGLISH_TEACHER_API_HOST", "127.0.0.1")
+    API_PORT = int(os.getenv("ENGLISH_TEACHER_API_PORT", "8000"))
+    API_BACKLOG = int(os.getenv("ENGLISH_TEACHER_API_BACKLOG", "1024"))
+    API_MAX_SESSIONS = int(os.getenv("ENGLISH_TEACHER_API_MAX_SESSIONS", "10000"))
+    API_SESSION_TTL = float(os.getenv("ENGLISH_TEACHER_API_SESSION_TTL", "1800"))
+    API_MAX_BODY_BYTES = int(os.getenv("ENGLISH_TEACHER_API_MAX_BODY_BYTES", "1000000"))
+    
     # English Teacher Agent Configuration
     TEACHER_SYSTEM_PROMPT = """You are an experienced English teacher and language learning assistant. Your role is to help students improve their English skills through:
 
@@ -40,3 +154,108 @@ Always maintain a friendly, patient, and professional tone."""
         "vocabulary": "Vocabulary Building",
         "writing": "Writing Practice"
     }
+    
+    # Teacher instructions per learning mode and level; prompts.py combines them with
+    # TEACHER_SYSTEM_PROMPT into one system prompt per mode, level and call kind
+    MODE_INSTRUCTIONS = {
+        "conversation": """- Engage in natural conversation
+- Gently correct mistakes when they occur
+- Ask follow-up questions to keep the conversation flowing
+- Provide explanations for corrections""",
+        "grammar": """- Focus specifically on grammar corrections
+- Explain grammar rules clearly
+- Provide examples of correct usage
+- Identify patterns in the student's mistakes""",
+        "vocabulary": """- Suggest better word choices
+- Explain word meanings and usage
+- Provide synonyms and antonyms
+- Give examples of how to use new words""",
+        "writing": """- Review the student's writing
+- Suggest improvements for clarity and style
+- Focus on sentence structure and flow
+- Provide constructive feedback"""
+    }
+    
+    LEVEL_CONTEXT = {
+        "beginner": "The student is a beginner. Use simple vocabulary and short sentences. Focus on basic grammar and common words.",
+        "intermediate": "The student is at an intermediate level. Use varied vocabulary and explain more complex grammar concepts.",
+        "advanced": "The student is advanced. Focus on nuanced language, idioms, and sophisticated expressions."
+    }
+    
+    # System prompts of the analysis and summary requests
+    ANALYSIS_SYSTEM_PROMPT = "You are a language analysis assistant. Provide concise, helpful feedback."
+    SUMMARY_SYSTEM_PROMPT = "Update the running summary of this English learning conversation. Keep it brief, highlighting key topics and improvements."
+    
+    # Analysis instructions per learning mode
+    ANALYSIS_PROMPTS = {
+        "grammar": "Analyze this text for grammar mistakes. List any errors and provide corrections with explanations.",
+        "vocabulary": "Analyze this text for vocabulary improvements. Suggest better word choices and explain why.",
+        "writing": "Analyze this text for writing quality. Suggest improvements for clarity, style, and structure.",
+        "conversation": "Analyze this text for any language issues. Provide gentle corrections and suggestions."
+    }
+    
+    # Appended to the system prompt in structured response mode
+    STRUCTURED_RESPONSE_PROMPT = """Reply with a JSON object with exactly two string fields:
+- "response": your reply to the student, following the instructions above
+- "feedback": concise feedback on the student's latest message. {analysis_prompt}"""
+    
+    @classmethod
+    def get_models(cls, call: str, mode: str, level: str, input_chars: int) -> tuple:
+        """Return the models to try, in order, for a call kind, mode, level and input length."""
+        for route in cls.MODEL_ROUTES:
+            if route.get("call", call) != call:
+                continue
+            if mode not in route.get("modes", (mode,)) or level not in route.get("levels", (level,)):
+                continue
+            if not route.get("min_chars", 0) <= input_chars <= route.get("max_chars", input_chars):
+                continue
+            return tuple(route["models"])
+        return (cls.DEFAULT_MODEL,)
+    
+    @classmethod
+    def get_context_budget(cls, mode: str, level: str) -> int:
+        """Return the prompt token budget for a mode and level."""
+        budget = cls.CONTEXT_TOKEN_BUDGETS.get(mode, cls.CONTEXT_TOKEN_BUDGETS["conversation"])
+        return int(budget * cls.CONTEXT_LEVEL_SCALE.get(level, 1.0))
+    
+    # Static UI content
+    MODE_DESCRIPTIONS = {
+        "conversation": "Practice natural conversation with gentle corrections",
+        "grammar": "Focus on grammar corrections and explanations",
+        "vocabulary": "Improve your vocabulary with better word choices",
+        "writing": "Get feedback on your writing style and structure"
+    }
+    
+    EXAMPLES = {
+        "conversation": "Hi! I'm learning English. Can we talk about your favorite hobby?",
+        "grammar": "I have went to the store yesterday and buyed some apples.",
+        "vocabulary": "The weather is very good today. I feel happy.",
+        "writing": "I want to write a letter to my friend about my vacation."
+    }
+    
+    LEARNING_TIPS = {
+        "conversation": [
+            "💬 Don't worry about making mistakes - they're part of learning!",
+            "🔄 Try to use new vocabulary you've learned",
+            "❓ Ask questions to keep the conversation flowing",
+            "🎯 Focus on expressing your ideas clearly"
+        ],
+        "grammar": [
+            "📝 Pay attention to verb tenses",
+            "🔍 Look for patterns in your mistakes",
+            "📚 Practice with similar sentences",
+            "✅ Review corrections carefully"
+        ],
+        "vocabulary": [
+            "📖 Learn words in context",
+            "🔄 Use new words in different sentences",
+            "📝 Keep a vocabulary notebook",
+            "🎯 Focus on words you use often"
+        ],
+        "writing": [
+            "✍️ Plan your ideas before writing",
+            "📝 Use varied sentence structures",
+            "🔍 Check for clarity and flow",
+            "📚 Read your writing aloud"
+        ]
+    }
@@ -0,0 +1,135 @@
+"""
+Append-only SQLite store for conversation exchanges.
+
+Each exchange (student input, teacher response, analysis, mode, level) is
+stored once under its session id, and each session remembers the student
+it belongs to. Lookups go through the (session_id, id)
+index, so reading the latest page or the recent context window costs the
+same however long the session is.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import Config
+
+
+class ConversationStore:
+    """Thread-safe append-only store of exchanges keyed by session."""
+
+    def __init__(self, path: str = ":memory:"):
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS exchanges (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    user_input TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    analysis TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS exchanges_session ON exchanges (session_id, id)")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    student_id TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+
+    def register_session(self, session_id: str, student_id: str):
+        """Record the student a session belongs to; the first registration wins."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, student_id, created_at) VALUES (?, ?, ?)",
+                (session_id, student_id, time.time())
+            )
+            self._db.commit()
+
+    def student_of(self, session_id: str) -> Optional[str]:
+        """Return the student a session was registered to, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT student_id FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def append(self, session_id: str, user_input: str, response: str, analysis: Dict, mode: str, level: str) -> int:
+        """Store one exchange and return its id."""
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO exchanges (session_id, user_input, response, analysis, mode, level, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, user_input, response, json.dumps(analysis, ensure_ascii=False), mode, level, time.time())
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def count(self, session_id: str) -> int:
+        """Return the number of exchanges in a session."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM exchanges WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def latest(self, session_id: str, limit: int, offset: int = 0) -> List[Dict]:
+        """
+        Return a page of exchanges, newest first.
+
+        Args:
+            session_id: Session to read
+            limit: Page size
+            offset: Number of newer exchanges to skip
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, user_input, response, analysis, mode, level, created_at FROM exchanges "
+                "WHERE session_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (session_id, limit, offset)
+            ).fetchall()
+
+        return [{
+            "id": row[0],
+            "user_input": row[1],
+            "response": row[2],
+            "analysis": json.loads(row[3]),
+            "mode": row[4],
+            "level": row[5],
+            "timestamp": row[6]
+        } for row in rows]
+
+    def recent_messages(self, session_id: str, exchanges: int) -> List[Dict]:
+        """Return the last exchanges of a session as chat messages, oldest first."""
+        messages = []
+        for exchange in reversed(self.latest(session_id, exchanges)):
+            messages.append({"role": "user", "content": exchange["user_input"]})
+            messages.append({"role": "assistant", "content": exchange["response"]})
+        return messages
+
+
+_shared_store: Optional[ConversationStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Return the process-wide store at Config.CONVERSATION_DB_PATH, creating it on first use."""
+    global _shared_store
+
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = ConversationStore(Config.CONVERSATION_DB_PATH or ":memory:")
+    return _shared_store
@@ -1,22 +1,603 @@
+import httpx
 import openai
-from typing import List, Dict, Optional
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Iterator, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from config import Config
+from conversation_store import ConversationStore, get_conversation_store
+from grammar_rules import check_grammar, fast_path_stats, format_feedback
+from semantic_cache import semantic_cache
+from mistake_index import MistakeIndex, get_mistake_index
+from metrics import cached_prompt_tokens, registry as metrics
+from prompts import prompt_registry
+import hashlib
 import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
 
-class EnglishTeacher:
+# Shared worker pool used to run the reply and analysis requests side by side
+_executor = ThreadPoolExecutor(max_workers=Config.MAX_WORKERS, thread_name_prefix="english-teacher")
+
+# Separate pool for the chunks of a long analysis, which itself runs on _executor
+_chunk_executor = ThreadPoolExecutor(max_workers=Config.MAX_WORKERS, thread_name_prefix="english-teacher-chunk")
+
+PARAGRAPH_PATTERN = re.compile(r"[^\n]*\S[^\n]*(?:\n[^\n]*\S[^\n]*)*")
+SENTENCE_PATTERN = re.compile(r"[^.!?]+(?:[.!?]+|$)\s*")
+
+
+class ResponseCache:
+    """Two-tier cache for stateless LLM requests.
+    
+    Entries live in an in-memory LRU and, when a path is given, in a SQLite
+    file that survives restarts. Both tiers evict by size and by TTL.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400, path: Optional[str] = None,
+                 disk_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = None
+        
+        if path:
+            if path != ":memory:":
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS response_cache_expires_at ON response_cache (expires_at)")
+            self._db.commit()
+    
+    @staticmethod
+    def make_key(model: str, prompt_template: str, user_input: str, temperature: float) -> str:
+        """Build a cache key; the input is normalized so whitespace changes still hit."""
+        normalized = " ".join(user_input.split())
+        payload = json.dumps([model, prompt_template, normalized, temperature])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached value for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._entries[key]
+            
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM response_cache WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self.hits += 1
+                    return dict(value)
+            
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, value: Dict):
+        """Store value under key in both tiers."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+            
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at)
+                )
+                self._writes += 1
+                if self._writes % 100 == 0:
+                    self._evict_disk()
+                self._db.commit()
+    
+    def preload(self) -> int:
+        """Fill the in-memory tier with the newest unexpired disk entries; returns how many were loaded."""
+        if self._db is None:
+            return 0
+        
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value, expires_at FROM response_cache WHERE expires_at > ? ORDER BY expires_at DESC LIMIT ?",
+                (time.time(), self.max_entries)
+            ).fetchall()
+            # Oldest first, so the newest entries end up most recently used
+            for key, value, expires_at in reversed(rows):
+                self._store(key, json.loads(value), expires_at)
+        return len(rows)
+    
+    def clear(self):
+        """Drop every entry from both tiers and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+    
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the in-memory size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries)
+            }
+    
+    def _store(self, key: str, value: Dict, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _evict_disk(self):
+        self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,)
+        )
+
+
+# Process-wide cache shared by every teacher instance
+response_cache = ResponseCache(
+    max_entries=Config.CACHE_MAX_ENTRIES,
+    ttl=Config.CACHE_TTL,
+    path=Config.CACHE_PATH or None
+)
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one.
+    
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait for its result (or exception) instead of repeating it.
+    Nothing is kept once the call finishes, so this is not a cache.
+    """
+    
     def __init__(self):
-        if not Config.OPENAI_API_KEY:
-            raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY in your environment variables.")
+        self.collapsed = 0
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(*payload) -> str:
+        """Build a key from the complete JSON-serializable request payload."""
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    
+    def do(self, key: str, call, timeout: Optional[float] = None) -> Tuple[object, bool]:
+        """
+        Run call() unless an identical call is in flight, and share its outcome.
+        
+        Args:
+            key: Key from make_key
+            call: Function making the request
+            timeout: Seconds a waiting caller gives the running call before
+                raising concurrent.futures.TimeoutError; the call itself goes on
+        
+        Returns:
+            (result, whether this caller ran the call)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.collapsed += 1
+        
+        if not leader:
+            return future.result(timeout), False
         
         try:
-            # Initialize OpenAI client with explicit parameters
-            self.client = openai.OpenAI(
-                api_key=Config.OPENAI_API_KEY,
-                timeout=30.0
-            )
-            self.conversation_history = []
-        except Exception as e:
-            raise ValueError(f"Failed to initialize OpenAI client: {str(e)}. Please check your API key and internet connection.")
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, True
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+# Process-wide single-flight layer shared by every teacher instance
+request_flight = SingleFlight()
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client() -> openai.OpenAI:
+    """
+    Return the process-wide OpenAI client, creating it on first use.
+    
+    The client is thread-safe, so every session shares one HTTP connection
+    pool sized by the OPENAI_* settings in Config.
+    """
+    global _shared_client
+    
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                if not Config.OPENAI_API_KEY:
+                    raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY in your environment variables.")
+                
+                try:
+                    http_client = httpx.Client(
+                        limits=httpx.Limits(
+                            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+                            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY
+                        ),
+                        timeout=Config.OPENAI_TIMEOUT
+                    )
+                    # Retries are handled by EnglishTeacher._chat_completion
+                    _shared_client = openai.OpenAI(
+                        api_key=Config.OPENAI_API_KEY,
+                        base_url=Config.OPENAI_BASE_URL or None,
+                        timeout=Config.OPENAI_TIMEOUT,
+                        max_retries=0,
+                        http_client=http_client
+                    )
+                except Exception as e:
+                    raise ValueError(f"Failed to initialize OpenAI client: {str(e)}. Please check your API key and internet connection.")
+    
+    return _shared_client
+
+
+def warm_up_connection(client: Optional[openai.OpenAI] = None) -> bool:
+    """
+    Open a pooled connection to the API base URL before the first student needs it.
+    
+    Returns:
+        Whether the API could be reached; an error status still leaves the
+        connection in the pool, so only connection failures return False
+    """
+    try:
+        (client or get_shared_client()).with_options(timeout=Config.WARM_UP_TIMEOUT).models.list()
+    except openai.APIStatusError:
+        pass
+    except openai.APIError:
+        return False
+    return True
+
+
+class QueueFullError(Exception):
+    """Raised when the request admission queue is full."""
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter for requests per minute and tokens per minute.
+    
+    Callers are admitted in FIFO order. With max_queue set, a caller that
+    would have to wait behind max_queue others is rejected with QueueFullError.
+    A limit of 0 disables that dimension.
+    """
+    
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float = 0, max_queue: int = 0):
+        self.requests_per_second = requests_per_minute / 60.0
+        self.tokens_per_second = tokens_per_minute / 60.0
+        self.max_queue = max_queue
+        
+        # Buckets hold about one second of capacity; tokens may go into debt
+        # so a single large request is never blocked forever
+        self._request_capacity = max(1.0, self.requests_per_second)
+        self._token_capacity = self.tokens_per_second
+        self._requests = self._request_capacity
+        self._tokens = self._token_capacity
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._condition = threading.Condition()
+    
+    def acquire(self, tokens: int = 0, on_wait=None):
+        """
+        Block until the caller may send a request costing about tokens tokens.
+        
+        Args:
+            tokens: Estimated prompt plus completion tokens of the request
+            on_wait: Optional callback called with the caller's 1-based queue
+                position whenever it changes while waiting. It runs without
+                the limiter's lock held, so a slow callback only delays its
+                own caller.
+        """
+        with self._condition:
+            if self.max_queue and len(self._waiters) >= self.max_queue:
+                raise QueueFullError("The teacher is helping a lot of students right now. Please try again in a moment")
+            
+            ticket = object()
+            self._waiters.append(ticket)
+        
+        last_position = None
+        try:
+            while True:
+                with self._condition:
+                    self._refill()
+                    is_next = self._waiters[0] is ticket
+                    if is_next and self._has_capacity():
+                        if self.requests_per_second:
+                            self._requests -= 1
+                        if self.tokens_per_second:
+                            self._tokens -= tokens
+                        return
+                    
+                    position = self._waiters.index(ticket) + 1
+                    if on_wait is None or position == last_position:
+                        self._condition.wait(self._time_until_capacity() if is_next else 1.0)
+                        continue
+                
+                on_wait(position)
+                last_position = position
+        finally:
+            with self._condition:
+                self._waiters.remove(ticket)
+                self._condition.notify_all()
+    
+    def queue_length(self) -> int:
+        """Return how many callers are waiting for admission."""
+        with self._condition:
+            return len(self._waiters)
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self._request_capacity, self._requests + elapsed * self.requests_per_second)
+        self._tokens = min(self._token_capacity, self._tokens + elapsed * self.tokens_per_second)
+    
+    def _has_capacity(self) -> bool:
+        requests_ok = not self.requests_per_second or self._requests >= 1
+        tokens_ok = not self.tokens_per_second or self._tokens >= 0
+        return requests_ok and tokens_ok
+    
+    def _time_until_capacity(self) -> float:
+        wait = 0.0
+        if self.requests_per_second and self._requests < 1:
+            wait = (1 - self._requests) / self.requests_per_second
+        if self.tokens_per_second and self._tokens < 0:
+            wait = max(wait, -self._tokens / self.tokens_per_second)
+        return max(wait, 0.001)
+
+
+# Process-wide limiter shared by every teacher instance
+request_limiter = RateLimiter(
+    requests_per_minute=Config.RATE_LIMIT_RPM,
+    tokens_per_minute=Config.RATE_LIMIT_TPM,
+    max_queue=Config.RATE_LIMIT_MAX_QUEUE
+)
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+# Errors that move a request to the next model of its route; NotFoundError covers unavailable models
+FALLBACK_ERRORS = RETRYABLE_ERRORS + (openai.NotFoundError,)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the delay in seconds requested by the server's Retry-After headers, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None  # HTTP-date values are rare for this API; use the backoff instead
+    return None
+
+
+def get_retry_delay(attempt: int, error: Exception) -> float:
+    """Return the wait before retry number attempt: full-jitter exponential backoff, at least Retry-After."""
+    backoff = min(Config.RETRY_MAX_DELAY, Config.RETRY_BASE_DELAY * (2 ** attempt))
+    delay = random.uniform(0, backoff)
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+# Rough token accounting used to budget prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text (about four characters per token)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(message: Dict) -> int:
+    """Estimate the tokens a chat message costs, including its framing."""
+    return estimate_tokens(message["content"]) + MESSAGE_TOKEN_OVERHEAD
+
+
+class ContextBuilder:
+    """Fill a prompt token budget with the newest conversation history first.
+    
+    Older messages that do not fit are dropped. The oldest message that only
+    partly fits is truncated when enough of the budget is left for it.
+    """
+    
+    MIN_COMPRESSED_TOKENS = 32
+    
+    def __init__(self, budget: int):
+        self.budget = budget
+    
+    def build(self, system_prompt: str, history: List[Dict], user_input: str) -> Dict:
+        """
+        Build the message list for one request.
+        
+        Returns:
+            Dictionary with the messages, the estimated prompt tokens and how
+            many history messages were kept
+        """
+        system_message = {"role": "system", "content": system_prompt}
+        user_message = {"role": "user", "content": user_input}
+        used = estimate_message_tokens(system_message) + estimate_message_tokens(user_message)
+        
+        kept = []
+        for message in reversed(history):
+            remaining = self.budget - used
+            cost = estimate_message_tokens(message)
+            if cost <= remaining:
+                kept.append(message)
+                used += cost
+                continue
+            
+            # Keep the tail of the message if a useful part of it still fits
+            room = remaining - MESSAGE_TOKEN_OVERHEAD
+            if room >= self.MIN_COMPRESSED_TOKENS:
+                content = "..." + message["content"][-(room - 1) * CHARS_PER_TOKEN:]
+                compressed = {"role": message["role"], "content": content}
+                kept.append(compressed)
+                used += estimate_message_tokens(compressed)
+            break
+        
+        kept.reverse()
+        return {
+            "messages": [system_message] + kept + [user_message],
+            "prompt_tokens": used,
+            "history_messages": len(kept)
+        }
+
+
+def split_into_chunks(text: str, max_chars: int, min_chars: int = 200) -> List[Tuple[int, int]]:
+    """
+    Split text into (start, end) chunks of at most max_chars on paragraph boundaries.
+    
+    Paragraphs longer than max_chars are split between sentences, and
+    sentences longer than max_chars between words. Paragraphs shorter than
+    min_chars (titles, greetings) are joined with the next one, or with the
+    previous one at the end of the text when the result still fits.
+    """
+    chunks = []
+    pending_start = None
+    min_chars = min(min_chars, max_chars)
+    
+    for paragraph in PARAGRAPH_PATTERN.finditer(text):
+        start, end = paragraph.span()
+        if pending_start is not None:
+            start, pending_start = pending_start, None
+        
+        if end - start < min_chars:
+            pending_start = start
+            continue
+        if end - start <= max_chars:
+            chunks.append((start, end))
+            continue
+        
+        # Group sentences until the chunk would grow past max_chars
+        chunk_start = start
+        for piece_start, piece_end in _sentence_spans(text, start, end, max_chars):
+            if piece_start > chunk_start and piece_end - chunk_start > max_chars:
+                chunks.append((chunk_start, piece_start))
+                chunk_start = piece_start
+        chunks.append((chunk_start, end))
+    
+    if pending_start is not None:
+        end = len(text.rstrip())
+        if chunks and end - chunks[-1][0] <= max_chars:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((pending_start, end))
+    
+    # Trim the whitespace left at sentence boundaries and drop chunks left empty
+    return [(start, start + len(text[start:end].rstrip())) for start, end in chunks if text[start:end].strip()]
+
+
+def _sentence_spans(text: str, start: int, end: int, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Yield the sentence spans of text[start:end], cutting sentences longer than max_chars at the last space that fits."""
+    for sentence in SENTENCE_PATTERN.finditer(text, start, end):
+        piece_start, piece_end = sentence.span()
+        while piece_end - piece_start > max_chars:
+            cut = text.rfind(" ", piece_start, piece_start + max_chars) + 1
+            if cut <= piece_start:
+                cut = piece_start + max_chars
+            yield piece_start, cut
+            piece_start = cut
+        yield piece_start, piece_end
+
+
+class TeacherTurn(BaseModel):
+    """Structured output of a single combined reply-and-analysis request."""
+    response: str
+    feedback: str
+
+
+class EnglishTeacher:
+    def __init__(self, structured: Optional[bool] = None, client: Optional[openai.OpenAI] = None,
+                 limiter: Optional[RateLimiter] = None, session_id: Optional[str] = None,
+                 store: Optional[ConversationStore] = None, student_id: Optional[str] = None,
+                 mistakes: Optional[MistakeIndex] = None, reuse_revisions: bool = True):
+        # Structured mode asks for the reply and the analysis in one request
+        self.structured = Config.STRUCTURED_RESPONSE if structured is None else structured
+        self.cache = response_cache if Config.CACHE_ENABLED else None
+        self.semantic_cache = semantic_cache if Config.SEMANTIC_CACHE_ENABLED else None
+        
+        # Sessions share one client; only the conversation data is per instance
+        self.client = client or get_shared_client()
+        self.limiter = limiter or request_limiter
+        self.last_prompt_tokens = 0
+        self.last_prompt_version = ""
+        
+        # Model that served the latest call of each kind (reply, analysis, summary)
+        self.last_models: Dict[str, str] = {}
+        
+        # Exchanges live in the conversation store; only the recent context
+        # window is kept in memory. Message counts below are absolute.
+        self.store = store or get_conversation_store()
+        self.session_id = session_id or uuid.uuid4().hex
+        
+        # Progress and mistakes are tracked per student across their sessions;
+        # a session rebuilt without a student id gets back the one it was created with
+        self.student_id = student_id or self.store.student_of(self.session_id) or self.session_id
+        self.store.register_session(self.session_id, self.student_id)
+        self.mistakes = mistakes or get_mistake_index()
+        self.conversation_history = self.store.recent_messages(self.session_id, Config.HISTORY_WINDOW_EXCHANGES)
+        self._message_count = 2 * self.store.count(self.session_id)
+        self._history_offset = self._message_count - len(self.conversation_history)
+        
+        # Chunk analyses of the last long submission, keyed by chunk text. Reuse
+        # is turned off when one instance grades unrelated texts (batch grading).
+        self.reuse_revisions = reuse_revisions
+        self._last_revision_chunks: Dict[str, Dict] = {}
+        
+        # Rolling session summary, updated incrementally in the background
+        self.summary = ""
+        self._summarized_messages = 0
+        self._summary_generation = 0
+        self._summary_future = None
+        self._summary_lock = threading.Lock()
         
     def get_teacher_response(self, user_input: str, mode: str = "conversation", level: str = "intermediate") -> Dict:
         """
@@ -31,148 +612,595 @@ class EnglishTeacher:
             Dictionary containing the teacher's response and analysis
         """
         
-        # Create mode-specific prompt
-        mode_prompt = self._get_mode_prompt(mode, level)
+        if self.structured:
+            return self._get_structured_response(user_input, mode, level)
+        
+        messages = self._build_messages(user_input, mode, level)
         
-        # Build conversation context
-        messages = [
-            {"role": "system", "content": Config.TEACHER_SYSTEM_PROMPT + "\n\n" + mode_prompt}
-        ]
+        # Send the reply and the analysis requests at the same time
+        reply_future = _executor.submit(self._create_reply, messages, mode, level)
+        analysis_future = _executor.submit(self._analyze_user_input, user_input, mode, level)
         
-        # Add conversation history
-        messages.extend(self.conversation_history[-6:])  # Keep last 3 exchanges
+        try:
+            teacher_response = reply_future.result(timeout=Config.REPLY_TIMEOUT)
+        except FutureTimeoutError:
+            analysis_future.cancel()
+            return self._error_result(f"no reply within {Config.REPLY_TIMEOUT:g} seconds", mode, level)
+        except Exception as e:
+            analysis_future.cancel()
+            return self._error_result(str(e), mode, level)
         
-        # Add current user input
-        messages.append({"role": "user", "content": user_input})
+        return self._finish_turn(user_input, teacher_response, analysis_future, mode, level)
+    
+    def stream_teacher_response(self, user_input: str, mode: str = "conversation", level: str = "intermediate",
+                                on_queue=None) -> "TeacherResponseStream":
+        """
+        Stream the teacher's response token by token.
         
+        Args:
+            user_input: The student's input text
+            mode: Learning mode (conversation, grammar, vocabulary, writing)
+            level: Student's English level (beginner, intermediate, advanced)
+            on_queue: Optional callback receiving the student's queue position
+                while the request waits for the rate limiter
+            
+        Returns:
+            An iterable of text deltas. Once it is exhausted, its ``result``
+            attribute holds the same dictionary get_teacher_response returns.
+        """
+        return TeacherResponseStream(self, user_input, mode, level, on_queue=on_queue)
+    
+    def _build_messages(self, user_input: str, mode: str, level: str, call: str = "reply") -> List[Dict]:
+        """Build the message list sent for the teacher's reply within the mode's token budget."""
+        
+        # Precompiled prompt; the per-session summary goes after it so the prefix stays identical
+        prompt = prompt_registry.get(call, mode, level)
+        system_prompt = prompt.text
+        self.last_prompt_version = prompt.version
+        
+        # Fill the budget with the most recent exchanges
+        builder = ContextBuilder(Config.get_context_budget(mode, level))
+        context = builder.build(system_prompt, self.conversation_history, user_input)
+        
+        # Let the rolling summary stand in for the exchanges that did not fit
+        if self.summary and context["history_messages"] < len(self.conversation_history):
+            system_prompt += "\n\nSummary of the earlier conversation:\n" + self.summary
+            context = builder.build(system_prompt, self.conversation_history, user_input)
+        self.last_prompt_tokens = context["prompt_tokens"]
+        
+        return context["messages"]
+    
+    def _finish_turn(self, user_input: str, teacher_response: str, analysis_future, mode: str, level: str) -> Dict:
+        """Wait for the analysis, record the exchange and build the result."""
+        
+        # The analysis is optional: a failure or timeout never hides the reply
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            analysis = analysis_future.result(timeout=Config.ANALYSIS_TIMEOUT)
+        except FutureTimeoutError:
+            analysis = {"error": f"Analysis failed: no result within {Config.ANALYSIS_TIMEOUT:g} seconds"}
+        
+        return self._record_turn(user_input, teacher_response, analysis, mode, level)
+    
+    def _record_turn(self, user_input: str, teacher_response: str, analysis: Dict, mode: str, level: str) -> Dict:
+        """Add the exchange to the conversation history and build the result."""
+        
+        self._store_exchange(user_input, teacher_response, analysis, mode, level)
+        self._remember_exchange(user_input, teacher_response)
+        return self._turn_result(teacher_response, analysis, mode, level)
+    
+    def _store_exchange(self, user_input: str, teacher_response: str, analysis: Dict, mode: str, level: str):
+        """Persist the exchange and index the mistakes found in its analysis."""
+        self.store.append(self.session_id, user_input, teacher_response, analysis, mode, level)
+        self.mistakes.record(self.student_id, self.session_id, mode, analysis.get("feedback", ""))
+    
+    def _remember_exchange(self, user_input: str, teacher_response: str):
+        """Add a stored exchange to the in-memory context window and schedule the summary."""
+        with self._summary_lock:
+            self.conversation_history.append({"role": "user", "content": user_input})
+            self.conversation_history.append({"role": "assistant", "content": teacher_response})
+            self._message_count += 2
+            excess = len(self.conversation_history) - 2 * Config.HISTORY_WINDOW_EXCHANGES
+            if excess > 0:
+                del self.conversation_history[:excess]
+                self._history_offset += excess
+        self._schedule_summary_update()
+    
+    def _turn_result(self, teacher_response: str, analysis: Dict, mode: str, level: str) -> Dict:
+        """Build the result returned for a finished turn."""
+        return {
+            "response": teacher_response,
+            "analysis": analysis,
+            "mode": mode,
+            "level": level,
+            "prompt_tokens": self.last_prompt_tokens,
+            "prompt_version": self.last_prompt_version,
+            "model": self.last_models.get("reply")
+        }
+    
+    def _get_structured_response(self, user_input: str, mode: str, level: str, on_queue=None) -> Dict:
+        """Get the reply and the analysis from a single JSON-mode request."""
+        messages = self._build_structured_messages(user_input, mode, level)
+        
+        try:
+            response = self._chat_completion(
+                ("reply", mode, level),
+                Config.get_models("reply", mode, level, len(user_input)),
+                on_queue=on_queue,
                 messages=messages,
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=800,
+                timeout=Config.REPLY_TIMEOUT,
+                response_format={"type": "json_object"}
             )
-            
-            teacher_response = response.choices[0].message.content
-            
-            # Analyze the user input for corrections and feedback
-            analysis = self._analyze_user_input(user_input, mode)
-            
-            # Update conversation history
-            self.conversation_history.append({"role": "user", "content": user_input})
-            self.conversation_history.append({"role": "assistant", "content": teacher_response})
-            
-            return {
-                "response": teacher_response,
-                "analysis": analysis,
-                "mode": mode,
-                "level": level
-            }
-            
         except Exception as e:
-            return {
-                "response": f"I apologize, but I encountered an error: {str(e)}. Please try again.",
-                "analysis": {"error": str(e)},
-                "mode": mode,
-                "level": level
-            }
+            return self._error_result(str(e), mode, level)
+        
+        teacher_response, analysis = self._parse_structured_turn(response.choices[0].message.content)
+        return self._record_turn(user_input, teacher_response, analysis, mode, level)
+    
+    def _build_structured_messages(self, user_input: str, mode: str, level: str) -> List[Dict]:
+        """Build the message list for the combined JSON-mode request."""
+        return self._build_messages(user_input, mode, level, call="structured")
+    
+    def _parse_structured_turn(self, content: str) -> Tuple[str, Dict]:
+        """Split a JSON-mode completion into the reply and the analysis."""
+        try:
+            turn = TeacherTurn.model_validate_json(content)
+            return turn.response, {"feedback": turn.feedback}
+        except ValidationError as e:
+            # Keep whatever the model wrote as the reply rather than failing the turn
+            return content, {"error": f"Analysis failed: invalid structured output ({e.error_count()} errors)"}
     
-    def _get_mode_prompt(self, mode: str, level: str) -> str:
-        """Generate mode-specific instructions for the teacher."""
+    def _chat_completion(self, labels: tuple, models: tuple, on_queue=None, **kwargs):
+        """
+        Send a chat completion request through the rate limiter, retrying
+        transient failures with jittered exponential backoff.
         
-        level_context = {
-            "beginner": "The student is a beginner. Use simple vocabulary and short sentences. Focus on basic grammar and common words.",
-            "intermediate": "The student is at an intermediate level. Use varied vocabulary and explain more complex grammar concepts.",
-            "advanced": "The student is advanced. Focus on nuanced language, idioms, and sophisticated expressions."
-        }
+        A failed or rate limited request moves on to the next model of the
+        route at once; the last model is retried with backoff. Identical
+        non-streaming requests in flight at the same time, from any session,
+        share one upstream call.
         
-        mode_instructions = {
-            "conversation": f"""
-            Mode: Conversation Practice
-            {level_context[level]}
-            - Engage in natural conversation
-            - Gently correct mistakes when they occur
-            - Ask follow-up questions to keep the conversation flowing
-            - Provide explanations for corrections
-            """,
-            
-            "grammar": f"""
-            Mode: Grammar Check
-            {level_context[level]}
-            - Focus specifically on grammar corrections
-            - Explain grammar rules clearly
-            - Provide examples of correct usage
-            - Identify patterns in the student's mistakes
-            """,
-            
-            "vocabulary": f"""
-            Mode: Vocabulary Building
-            {level_context[level]}
-            - Suggest better word choices
-            - Explain word meanings and usage
-            - Provide synonyms and antonyms
-            - Give examples of how to use new words
-            """,
+        Args:
+            labels: (call kind, mode, level) the call is recorded under in the metrics
+            models: Models to try in order, from Config.get_models
+            on_queue: Optional callback receiving the queue position while waiting
+            **kwargs: Arguments for client.chat.completions.create, without the model
             
-            "writing": f"""
-            Mode: Writing Practice
-            {level_context[level]}
-            - Review the student's writing
-            - Suggest improvements for clarity and style
-            - Focus on sentence structure and flow
-            - Provide constructive feedback
-            """
-        }
+        Returns:
+            The completion, or an iterator of chunks when kwargs has stream=True
+        """
+        if kwargs.get("stream"):
+            return self._send_completion(labels, models, on_queue, kwargs)[0]
         
-        return mode_instructions.get(mode, mode_instructions["conversation"])
+        started = time.perf_counter()
+        (response, model), leader = request_flight.do(
+            SingleFlight.make_key(models, kwargs),
+            lambda: self._send_completion(labels, models, on_queue, kwargs),
+            timeout=kwargs.get("timeout")
+        )
+        if not leader:
+            self.last_models[labels[0]] = model
+            metrics.record(*labels, model, time.perf_counter() - started, collapsed=True)
+        return response
     
-    def _analyze_user_input(self, user_input: str, mode: str) -> Dict:
-        """Analyze user input for specific feedback based on mode."""
+    def _send_completion(self, labels: tuple, models: tuple, on_queue, kwargs: Dict) -> Tuple[object, str]:
+        """Make the upstream request for _chat_completion and return it with the model that served it."""
+        tokens = sum(estimate_message_tokens(message) for message in kwargs["messages"]) + kwargs.get("max_tokens", 0)
+        started = time.perf_counter()
+        model_index = 0
         
-        analysis_prompts = {
-            "grammar": "Analyze this text for grammar mistakes. List any errors and provide corrections with explanations.",
-            "vocabulary": "Analyze this text for vocabulary improvements. Suggest better word choices and explain why.",
-            "writing": "Analyze this text for writing quality. Suggest improvements for clarity, style, and structure.",
-            "conversation": "Analyze this text for any language issues. Provide gentle corrections and suggestions."
-        }
+        for attempt in range(Config.RETRY_ATTEMPTS + 1):
+            model = models[model_index]
+            try:
+                self.limiter.acquire(tokens, on_wait=on_queue)
+                response = self.client.chat.completions.create(model=model, **kwargs)
+                break
+            except FALLBACK_ERRORS as e:
+                can_fall_back = model_index + 1 < len(models)
+                if attempt == Config.RETRY_ATTEMPTS or not (can_fall_back or isinstance(e, RETRYABLE_ERRORS)):
+                    metrics.record(*labels, model, time.perf_counter() - started, error=True)
+                    raise
+                if can_fall_back:
+                    # The next model has its own rate limits, so try it right away
+                    model_index += 1
+                else:
+                    time.sleep(get_retry_delay(attempt, e))
+            except Exception:
+                metrics.record(*labels, model, time.perf_counter() - started, error=True)
+                raise
+        
+        self.last_models[labels[0]] = model
+        if kwargs.get("stream"):
+            return self._instrument_stream(response, labels, model, started, fallback=model_index > 0), model
         
+        seconds = time.perf_counter() - started
+        usage = response.usage
+        metrics.record(
+            *labels, model, seconds,
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+            cached_tokens=cached_prompt_tokens(usage),
+            fallback=model_index > 0
+        )
+        return response, model
+    
+    def _instrument_stream(self, stream, labels: tuple, model: str, started: float, fallback: bool = False) -> Iterator:
+        """Pass stream chunks through, recording time to first token and usage when it ends."""
+        ttft = None
+        usage = None
+        error = False
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a language analysis assistant. Provide concise, helpful feedback."},
-                    {"role": "user", "content": f"{analysis_prompts[mode]}\n\nText: {user_input}"}
-                ],
-                temperature=0.3,
-                max_tokens=300
+            for chunk in stream:
+                if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+                    ttft = time.perf_counter() - started
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                yield chunk
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.record(
+                *labels, model, time.perf_counter() - started, ttft=ttft,
+                prompt_tokens=usage.prompt_tokens if usage else 0,
+                completion_tokens=usage.completion_tokens if usage else 0,
+                cached_tokens=cached_prompt_tokens(usage),
+                error=error, fallback=fallback
             )
-            
-            return {"feedback": response.choices[0].message.content}
-            
+    
+    def _error_result(self, error: str, mode: str, level: str) -> Dict:
+        """Build the result returned to the UI when the teacher's reply fails."""
+        return {
+            "response": f"I apologize, but I encountered an error: {error}. Please try again.",
+            "analysis": {"error": error},
+            "mode": mode,
+            "level": level
+        }
+    
+    def _create_reply(self, messages: List[Dict], mode: str, level: str) -> str:
+        """Request the teacher's reply for an already built message list."""
+        response = self._chat_completion(
+            ("reply", mode, level),
+            Config.get_models("reply", mode, level, len(messages[-1]["content"])),
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            timeout=Config.REPLY_TIMEOUT
+        )
+        
+        return response.choices[0].message.content
+    
+    def _stream_reply(self, messages: List[Dict], mode: str, level: str, on_queue=None) -> Iterator[str]:
+        """Request the teacher's reply with streaming and yield its text deltas."""
+        stream = self._chat_completion(
+            ("reply", mode, level),
+            Config.get_models("reply", mode, level, len(messages[-1]["content"])),
+            on_queue=on_queue,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=500,
+            timeout=Config.REPLY_TIMEOUT,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _analyze_user_input(self, user_input: str, mode: str, level: str = "intermediate", use_cache: bool = True) -> Dict:
+        """Analyze user input for specific feedback based on mode.
+        
+        Common grammar mistakes are found by the local rules first, and the
+        request only asks the model for the remaining issues. Identical requests are
+        served from the response cache and near-duplicates from the semantic
+        cache unless use_cache is False.
+        """
+        
+        if mode in Config.CHUNKED_ANALYSIS_MODES and len(user_input) > Config.CHUNK_MAX_CHARS:
+            return self._analyze_in_chunks(user_input, mode, level, use_cache)
+        
+        return self._analyze_text(user_input, mode, level, use_cache)
+    
+    def _analyze_text(self, user_input: str, mode: str, level: str, use_cache: bool) -> Dict:
+        """Analyze user input with at most one request, without splitting it into chunks."""
+        plan = self._plan_analysis(user_input, mode, level, use_cache)
+        if "result" in plan:
+            return plan["result"]
+        
+        try:
+            response = self._chat_completion(("analysis", mode, level), plan["models"], **plan["request"])
         except Exception as e:
-            return {"error": f"Analysis failed: {str(e)}"}
+            return self._analysis_failed(plan, e)
+        
+        return self._finish_analysis(plan, response.choices[0].message.content)
+    
+    def _plan_analysis(self, user_input: str, mode: str, level: str, use_cache: bool) -> Dict:
+        """
+        Run the local steps of an analysis: grammar rules and cache lookups.
+        
+        Returns:
+            Dictionary with the finished analysis under "result", or with the
+            route under "models", the completion arguments under "request" and
+            what _finish_analysis needs
+        """
+        started = time.perf_counter()
+        prompt = prompt_registry.get("analysis", mode, level)
+        instructions = ""
+        max_tokens = 300
+        local_feedback = ""
+        models = Config.get_models("analysis", mode, level, len(user_input))
+        
+        if Config.FAST_GRAMMAR_CHECK and mode in Config.FAST_GRAMMAR_MODES:
+            corrections = check_grammar(user_input)
+            if corrections:
+                local_feedback = format_feedback(corrections)
+                instructions = f"These mistakes were already found, so do not repeat them. Only report other issues:\n{local_feedback}\n\n"
+                max_tokens = Config.FAST_GRAMMAR_SHRUNK_MAX_TOKENS
+            fast_path_stats.count(shrunk=bool(corrections))
+        
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = ResponseCache.make_key(models[0], prompt.version + instructions, user_input, 0.3)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.record("analysis", mode, level, models[0], time.perf_counter() - started, cache_hit=True)
+                return {"result": cached}
+        
+        semantic_key = None
+        threshold = Config.SEMANTIC_CACHE_THRESHOLDS.get(mode)
+        if use_cache and self.semantic_cache is not None and threshold is not None:
+            semantic_key = (ResponseCache.make_key(models[0], prompt.version + instructions, "", 0.3), user_input)
+            cached = self.semantic_cache.get(semantic_key[0], user_input, threshold)
+            if cached is not None:
+                metrics.record("analysis", mode, level, models[0], time.perf_counter() - started, cache_hit=True)
+                return {"result": cached}
+        
+        return {
+            "models": models,
+            "request": {
+                "messages": [
+                    {"role": "system", "content": prompt.text},
+                    {"role": "user", "content": f"{instructions}Text: {user_input}"}
+                ],
+                "temperature": 0.3,
+                "max_tokens": max_tokens,
+                "timeout": Config.ANALYSIS_TIMEOUT
+            },
+            "local_feedback": local_feedback,
+            "cache_key": cache_key,
+            "semantic_key": semantic_key
+        }
+    
+    def _finish_analysis(self, plan: Dict, feedback: str) -> Dict:
+        """Combine the model's feedback with the local feedback and cache the result."""
+        local_feedback = plan["local_feedback"]
+        analysis = {"feedback": f"{local_feedback}\n\n{feedback}" if local_feedback else feedback}
+        if plan["cache_key"] is not None:
+            self.cache.set(plan["cache_key"], analysis)
+        if plan["semantic_key"] is not None:
+            self.semantic_cache.set(*plan["semantic_key"], analysis)
+        return analysis
+    
+    def _analysis_failed(self, plan: Dict, error: Exception) -> Dict:
+        """Fall back to the local feedback, if any, when the analysis request fails."""
+        if plan["local_feedback"]:
+            return {"feedback": plan["local_feedback"]}
+        return {"error": f"Analysis failed: {str(error)}"}
+    
+    def _analyze_in_chunks(self, user_input: str, mode: str, level: str, use_cache: bool) -> Dict:
+        """
+        Analyze a long text as concurrent chunks and merge the feedback in order.
+        
+        Chunks identical to one in the previous submission reuse its analysis,
+        so a revised draft only re-analyzes the paragraphs that changed.
+        
+        Returns:
+            Dictionary with the merged feedback and a "chunks" list holding each
+            chunk's offsets into user_input, its analysis and whether it was reused
+        """
+        spans = split_into_chunks(user_input, Config.CHUNK_MAX_CHARS)
+        previous = self._previous_revision()
+        
+        futures = {
+            chunk: _chunk_executor.submit(self._analyze_text, chunk, mode, level, use_cache)
+            for chunk in self._chunks_to_analyze(user_input, spans, previous)
+        }
+        
+        analyses = {}
+        for chunk, future in futures.items():
+            try:
+                analyses[chunk] = future.result(timeout=Config.ANALYSIS_TIMEOUT)
+            except FutureTimeoutError:
+                analyses[chunk] = {"error": f"Analysis failed: no result within {Config.ANALYSIS_TIMEOUT:g} seconds"}
+        
+        return self._merge_chunks(user_input, spans, analyses, previous)
+    
+    def _previous_revision(self) -> Dict[str, Dict]:
+        """Return the chunk analyses to reuse, read once so a concurrent submission cannot swap them mid-call."""
+        return self._last_revision_chunks if self.reuse_revisions else {}
+    
+    def _chunks_to_analyze(self, user_input: str, spans: List[Tuple[int, int]], previous: Dict[str, Dict]) -> List[str]:
+        """Return the distinct chunk texts not covered by the previous revision, in order."""
+        pending = []
+        for start, end in spans:
+            chunk = user_input[start:end]
+            if chunk not in previous and chunk not in pending:
+                pending.append(chunk)
+        return pending
+    
+    def _merge_chunks(self, user_input: str, spans: List[Tuple[int, int]], analyses: Dict[str, Dict],
+                      previous: Dict[str, Dict]) -> Dict:
+        """Merge new and reused chunk analyses in text order and remember them for the next revision."""
+        chunks = []
+        current = {}
+        for start, end in spans:
+            chunk = user_input[start:end]
+            reused = chunk in previous
+            analysis = previous[chunk] if reused else analyses[chunk]
+            if "feedback" in analysis:
+                current[chunk] = analysis
+            chunks.append(dict(analysis, start=start, end=end, reused=reused))
+        if self.reuse_revisions:
+            self._last_revision_chunks = current
+        
+        sections = []
+        for index, chunk in enumerate(chunks, 1):
+            body = chunk.get("feedback") or chunk["error"]
+            sections.append(f"**Part {index}** (characters {chunk['start']}–{chunk['end']}):\n{body}")
+        
+        result = {"feedback": "\n\n".join(sections), "chunks": chunks}
+        if all("error" in chunk for chunk in chunks):
+            result = {"error": chunks[0]["error"], "chunks": chunks}
+        return result
+    
+    def exchange_count(self) -> int:
+        """Return the number of exchanges in the current session."""
+        return self._message_count // 2
+    
+    def get_history_page(self, page: int = 0, page_size: int = 10) -> List[Dict]:
+        """Return one page of the session's exchanges from the store, newest first."""
+        return self.store.latest(self.session_id, page_size, offset=page * page_size)
+    
+    def get_progress(self) -> Dict:
+        """Return the student's exchange and mistake counters across all their sessions."""
+        return self.mistakes.progress(self.student_id)
+    
+    def get_frequent_mistakes(self, limit: int = 5) -> List[Dict]:
+        """Return the student's most repeated mistakes, most frequent first."""
+        return self.mistakes.frequent_mistakes(self.student_id, limit)
     
     def clear_conversation(self):
-        """Clear the conversation history."""
-        self.conversation_history = []
+        """Start a new session; earlier exchanges stay in the append-only store."""
+        with self._summary_lock:
+            self.session_id = uuid.uuid4().hex
+            self.store.register_session(self.session_id, self.student_id)
+            self.conversation_history = []
+            self._message_count = 0
+            self._history_offset = 0
+            self._last_revision_chunks = {}
+            self.summary = ""
+            self._summarized_messages = 0
+            self._summary_generation += 1
     
     def get_conversation_summary(self) -> str:
-        """Get a summary of the current conversation session."""
-        if not self.conversation_history:
+        """Get a summary of the current conversation session.
+        
+        Returns the rolling summary right away when one exists, and refreshes
+        it in the background if new exchanges arrived since it was written.
+        """
+        if not self._message_count:
             return "No conversation history available."
         
+        if self.summary:
+            self._schedule_summary_update(force=True)
+            return self.summary
+        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "Provide a brief summary of this English learning conversation, highlighting key topics and improvements."},
-                    {"role": "user", "content": f"Conversation history: {json.dumps(self.conversation_history, indent=2)}"}
-                ],
-                temperature=0.5,
-                max_tokens=200
-            )
-            
-            return response.choices[0].message.content
-            
+            self._update_summary()
         except Exception as e:
             return f"Could not generate summary: {str(e)}"
+        
+        return self.summary
+    
+    def _schedule_summary_update(self, force: bool = False):
+        """Fold new exchanges into the rolling summary on the worker pool.
+        
+        Runs every Config.SUMMARY_EVERY_TURNS exchanges, or for any new
+        exchange when force is set. At most one update runs at a time.
+        """
+        with self._summary_lock:
+            if not self._summary_due(force):
+                return
+            if self._summary_future is not None and not self._summary_future.done():
+                return
+            self._summary_future = _executor.submit(self._update_summary)
+    
+    def _summary_due(self, force: bool) -> bool:
+        """Return whether enough new exchanges arrived to update the summary; call with _summary_lock held."""
+        pending_turns = (self._message_count - self._summarized_messages) // 2
+        return pending_turns > 0 and (force or pending_turns >= Config.SUMMARY_EVERY_TURNS)
+    
+    def _update_summary(self):
+        """Update the summary from the previous summary plus the exchanges it does not cover yet."""
+        update = self._plan_summary_update()
+        if update is None:
+            return
+        
+        response = self._chat_completion(("summary", "session", "session"), update["models"], **update["request"])
+        self._apply_summary(update, response.choices[0].message.content)
+    
+    def _plan_summary_update(self) -> Optional[Dict]:
+        """Return the route and completion arguments for the next summary update, or None if nothing is new."""
+        with self._summary_lock:
+            generation = self._summary_generation
+            previous = self.summary
+            covered = self._message_count
+            # Exchanges that already left the in-memory window are not re-read
+            new_messages = self.conversation_history[max(0, self._summarized_messages - self._history_offset):]
+        
+        if not new_messages:
+            return None
+        
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in new_messages)
+        return {
+            "models": Config.get_models("summary", "session", "session", len(transcript)),
+            "request": {
+                "messages": [
+                    {"role": "system", "content": prompt_registry.get("summary").text},
+                    {"role": "user", "content": f"Current summary: {previous or 'None yet.'}\n\nNew exchanges:\n{transcript}"}
+                ],
+                "temperature": 0.5,
+                "max_tokens": 200
+            },
+            "generation": generation,
+            "covered": covered
+        }
+    
+    def _apply_summary(self, update: Dict, summary: str):
+        """Store a new summary unless the conversation was cleared in the meantime."""
+        with self._summary_lock:
+            if update["generation"] == self._summary_generation:
+                self.summary = summary
+                self._summarized_messages = update["covered"]
+
+class TeacherResponseStream:
+    """Iterable of the teacher's reply deltas for one turn.
+    
+    The analysis request starts together with the stream. The conversation
+    history is updated and ``result`` is set only after the last delta.
+    """
+    
+    def __init__(self, teacher: EnglishTeacher, user_input: str, mode: str, level: str, on_queue=None):
+        self.teacher = teacher
+        self.user_input = user_input
+        self.mode = mode
+        self.level = level
+        self.on_queue = on_queue
+        self.result: Optional[Dict] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        teacher = self.teacher
+        
+        # Structured output is a single JSON document, so it arrives in one piece
+        if teacher.structured:
+            self.result = teacher._get_structured_response(self.user_input, self.mode, self.level, on_queue=self.on_queue)
+            yield self.result["response"]
+            return
+        
+        messages = teacher._build_messages(self.user_input, self.mode, self.level)
+        analysis_future = _executor.submit(teacher._analyze_user_input, self.user_input, self.mode, self.level)
+        
+        chunks = []
+        try:
+            for delta in teacher._stream_reply(messages, self.mode, self.level, on_queue=self.on_queue):
+                chunks.append(delta)
+                yield delta
+        except Exception as e:
+            analysis_future.cancel()
+            self.result = teacher._error_result(str(e), self.mode, self.level)
+            yield ("\n\n" if chunks else "") + self.result["response"]
+            return
+        
+        self.result = teacher._finish_turn(self.user_input, "".join(chunks), analysis_future, self.mode, self.level)
@@ -0,0 +1,297 @@
+"""
+Local rule-based grammar checker.
+
+Finds common, deterministic mistakes (regularized irregular verbs, wrong
+forms after have/has/had and did/didn't, present perfect with finished-time
+expressions, subject-verb agreement, a/an) with precompiled patterns and
+word lookups. EnglishTeacher sends the mistakes it finds with the grammar
+analysis request so the model only has to report the remaining issues.
+"""
+
+import re
+import threading
+from typing import Dict, List, NamedTuple
+
+# base: (simple past, past participle)
+IRREGULAR_VERBS = {
+    "be": ("was", "been"), "begin": ("began", "begun"), "break": ("broke", "broken"),
+    "bring": ("brought", "brought"), "build": ("built", "built"), "buy": ("bought", "bought"),
+    "catch": ("caught", "caught"), "choose": ("chose", "chosen"), "come": ("came", "come"),
+    "cost": ("cost", "cost"), "cut": ("cut", "cut"), "do": ("did", "done"), "draw": ("drew", "drawn"),
+    "drink": ("drank", "drunk"), "drive": ("drove", "driven"), "eat": ("ate", "eaten"),
+    "fall": ("fell", "fallen"), "feel": ("felt", "felt"), "fight": ("fought", "fought"),
+    "find": ("found", "found"), "fly": ("flew", "flown"), "forget": ("forgot", "forgotten"),
+    "get": ("got", "gotten"), "give": ("gave", "given"), "go": ("went", "gone"),
+    "grow": ("grew", "grown"), "have": ("had", "had"), "hear": ("heard", "heard"),
+    "hide": ("hid", "hidden"), "hit": ("hit", "hit"), "hold": ("held", "held"), "hurt": ("hurt", "hurt"),
+    "keep": ("kept", "kept"), "know": ("knew", "known"), "leave": ("left", "left"), "lend": ("lent", "lent"),
+    "lose": ("lost", "lost"), "make": ("made", "made"), "mean": ("meant", "meant"), "meet": ("met", "met"),
+    "put": ("put", "put"), "read": ("read", "read"), "ride": ("rode", "ridden"), "ring": ("rang", "rung"),
+    "rise": ("rose", "risen"), "run": ("ran", "run"), "say": ("said", "said"), "see": ("saw", "seen"),
+    "sell": ("sold", "sold"), "send": ("sent", "sent"), "shut": ("shut", "shut"), "sing": ("sang", "sung"),
+    "sit": ("sat", "sat"), "sleep": ("slept", "slept"), "speak": ("spoke", "spoken"),
+    "spend": ("spent", "spent"), "stand": ("stood", "stood"), "steal": ("stole", "stolen"),
+    "swim": ("swam", "swum"), "take": ("took", "taken"), "teach": ("taught", "taught"),
+    "tell": ("told", "told"), "think": ("thought", "thought"), "throw": ("threw", "thrown"),
+    "understand": ("understood", "understood"), "wake": ("woke", "woken"), "wear": ("wore", "worn"),
+    "win": ("won", "won"), "write": ("wrote", "written"),
+}
+
+# Verbs checked for a missing third-person -s ("she drink" -> "she drinks")
+COMMON_VERBS = {
+    "like", "love", "want", "need", "live", "work", "play", "drink", "eat", "go", "have", "do", "make",
+    "know", "think", "say", "get", "see", "come", "take", "study", "watch", "read", "write", "speak",
+    "walk", "run", "cook", "listen", "try", "teach", "wash", "finish", "help", "feel", "look", "sleep",
+}
+
+# Time expressions that call for the simple past instead of the present perfect
+FINISHED_TIME_PATTERN = re.compile(
+    r"\b(yesterday|ago|last\s+(?:night|week|month|year|weekend|summer|winter|monday|tuesday|wednesday|"
+    r"thursday|friday|saturday|sunday)|in\s+(?:19|20)\d\d)\b", re.IGNORECASE
+)
+
+# Regular -ed forms that are real words and must not be flagged
+REAL_WORDS = {"bed", "seed", "singed", "ringed", "wined", "waked", "costed", "flied", "sited", "founded"}
+
+# Word beginnings taking "an"/"a" against their first letter: silent h, and u/eu/o sounding like "you"/"won"
+AN_EXCEPTIONS_PREFIXES = ("hour", "honest", "honor", "honour", "heir")
+A_EXCEPTIONS_PREFIXES = (
+    "unic", "unif", "unil", "unio", "uniq", "unis", "unit", "univ", "unan", "use", "usu", "usa", "uti", "ute",
+    "uku", "ubiq", "uri", "uran", "uro", "eu", "ewe", "one", "once", "uto"
+)
+
+
+class Correction(NamedTuple):
+    """One mistake found by the rules, with offsets into the checked text."""
+    category: str
+    original: str
+    correction: str
+    explanation: str
+    start: int
+    end: int
+
+
+def _regular_past_forms(base: str) -> List[str]:
+    """Return the wrong regular -ed forms students build for an irregular verb."""
+    if base.endswith("e"):
+        forms = [base + "d"]
+    elif base.endswith("y") and base[-2:-1] not in "aeiou":
+        forms = [base[:-1] + "ied", base + "ed"]
+    else:
+        forms = [base + "ed"]
+        if re.search(r"[^aeiou][aeiou][bcdfgklmnprtvz]$", base):
+            forms.append(base + base[-1] + "ed")
+    return forms
+
+
+def _third_person(verb: str) -> str:
+    if verb == "have":
+        return "has"
+    if verb in ("go", "do"):
+        return verb + "es"
+    if re.search(r"(s|sh|ch|x|z)$", verb):
+        return verb + "es"
+    if verb.endswith("y") and verb[-2] not in "aeiou":
+        return verb[:-1] + "ies"
+    return verb + "s"
+
+
+# Lookup tables built once at import
+WRONG_PAST_FORMS: Dict[str, str] = {}
+WRONG_PAST_TO_BASE: Dict[str, str] = {}
+for _base, (_past, _participle) in IRREGULAR_VERBS.items():
+    for _form in _regular_past_forms(_base):
+        if _form not in (_past, _participle) and _form not in REAL_WORDS:
+            WRONG_PAST_FORMS[_form] = _past
+            WRONG_PAST_TO_BASE[_form] = _base
+
+PAST_TO_BASE = {past: base for base, (past, participle) in IRREGULAR_VERBS.items() if past != base}
+# "have got" is correct English (possession), so "got" is never flagged after have/has
+PAST_TO_PARTICIPLE = {
+    past: participle for base, (past, participle) in IRREGULAR_VERBS.items()
+    if past != participle and past != "got"
+}
+
+_WORD = r"[A-Za-z']+"
+WORD_PATTERN = re.compile(_WORD)
+PERFECT_PATTERN = re.compile(r"\b(have|has|had|'ve|'s|'d)\s+(" + _WORD + r")", re.IGNORECASE)
+DID_PATTERN = re.compile(r"\b(did|didn't|did\s+not|does|doesn't|does\s+not|do|don't|do\s+not)\s+"
+                         r"((?:i|you|he|she|it|we|they)\s+)?(" + _WORD + r")", re.IGNORECASE)
+AGREEMENT_PATTERN = re.compile(
+    r"\b(?:(he|she|it)\s+(don't|are|were|have)|(i)\s+(is|are)|(you|we|they)\s+(is|was))\b", re.IGNORECASE
+)
+PREVIOUS_WORD_PATTERN = re.compile(r"(" + _WORD + r")\s+$")
+THIRD_PERSON_PATTERN = re.compile(r"\b(he|she|it)\s+(" + _WORD + r")\b", re.IGNORECASE)
+ARTICLE_PATTERN = re.compile(r"\b(a|an)\s+(" + _WORD + r")", re.IGNORECASE)
+
+# Words before "he/she/it" that make a following base verb correct ("does she like")
+BASE_VERB_TRIGGERS = {"did", "does", "do", "will", "would", "can", "could", "should", "may", "might", "must",
+                      "let", "make", "made", "help", "helped", "watch", "saw", "hear", "heard", "to", "why",
+                      "didn't", "doesn't", "won't", "can't", "couldn't", "shouldn't", "wouldn't"}
+
+# Words before a pronoun that make it part of a compound subject ("he and she like")
+COMPOUND_SUBJECT_WORDS = {"and"}
+
+# Words before "he/she/it" that make a following "were" the subjunctive ("I wish he were")
+SUBJUNCTIVE_TRIGGERS = {"if", "wish", "wished", "though", "only", "suppose", "imagine"}
+
+# Verbs taking a base-form subjunctive, directly or through "that" ("I suggest (that) he go")
+MANDATIVE_VERBS = {"suggest", "suggested", "insist", "insisted", "recommend", "recommended", "demand",
+                   "demanded", "request", "requested", "propose", "proposed", "require", "required",
+                   "ask", "asked", "advise", "advised", "urge", "urged"}
+
+AGREEMENT_FIXES = {
+    "don't": "doesn't", "are": "is", "were": "was", "have": "has",
+}
+
+
+def _match_case(original: str, replacement: str) -> str:
+    return replacement[:1].upper() + replacement[1:] if original[:1].isupper() else replacement
+
+
+def _previous_word(text: str, position: int) -> str:
+    """Return the lowercased word right before position, or "" at the start of a clause."""
+    match = PREVIOUS_WORD_PATTERN.search(text, max(0, position - 40), position)
+    return match.group(1).lower() if match else ""
+
+
+def _after_mandative_verb(text: str, position: int) -> bool:
+    """Whether the clause at position follows a mandative verb, as in "I suggest (that) he go"."""
+    match = PREVIOUS_WORD_PATTERN.search(text, max(0, position - 40), position)
+    if match and match.group(1).lower() == "that":
+        match = PREVIOUS_WORD_PATTERN.search(text, max(0, match.start() - 40), match.start())
+    return bool(match) and match.group(1).lower() in MANDATIVE_VERBS
+
+
+def check_grammar(text: str) -> List[Correction]:
+    """Return the mistakes the rules are confident about, ordered by position."""
+    corrections = []
+    finished_time = FINISHED_TIME_PATTERN.search(text)
+
+    for match in PERFECT_PATTERN.finditer(text):
+        auxiliary, verb = match.group(1), match.group(2)
+        lowered = verb.lower()
+        past = WRONG_PAST_FORMS.get(lowered, lowered)
+        if auxiliary.lower() in ("have", "has") and finished_time and (lowered in PAST_TO_PARTICIPLE or lowered in WRONG_PAST_FORMS):
+            corrections.append(Correction(
+                "tense", match.group(0), _match_case(verb, past),
+                f"Use the simple past with finished time expressions like '{finished_time.group(0)}'.",
+                match.start(), match.end()
+            ))
+        elif lowered in PAST_TO_PARTICIPLE and auxiliary.lower() not in ("'s", "'d"):
+            corrections.append(Correction(
+                "verb form", match.group(0), f"{auxiliary} {PAST_TO_PARTICIPLE[lowered]}",
+                f"After '{auxiliary}', use the past participle '{PAST_TO_PARTICIPLE[lowered]}'.",
+                match.start(), match.end()
+            ))
+
+    covered = [(c.start, c.end) for c in corrections]
+
+    for match in DID_PATTERN.finditer(text):
+        verb = match.group(3).lower()
+        base = PAST_TO_BASE.get(verb) or WRONG_PAST_TO_BASE.get(verb)
+        if base:
+            corrections.append(Correction(
+                "verb form", match.group(0), f"{match.group(1)} {match.group(2) or ''}{base}",
+                f"After '{match.group(1)}', use the base form of the verb.", match.start(), match.end()
+            ))
+            covered.append((match.start(), match.end()))
+
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group(0).lower()
+        if word in WRONG_PAST_FORMS and not any(start <= match.start() < end for start, end in covered):
+            corrections.append(Correction(
+                "irregular verb", match.group(0), _match_case(match.group(0), WRONG_PAST_FORMS[word]),
+                f"'{WRONG_PAST_FORMS[word]}' is the irregular past form.", match.start(), match.end()
+            ))
+
+    for match in AGREEMENT_PATTERN.finditer(text):
+        previous = _previous_word(text, match.start())
+        if match.group(1):
+            subject, verb = match.group(1), match.group(2)
+            fixed = AGREEMENT_FIXES[verb.lower()]
+        elif match.group(3):
+            subject, verb = match.group(3), match.group(4)
+            fixed = "am"
+        else:
+            subject, verb = match.group(5), match.group(6)
+            fixed = "are" if verb.lower() == "is" else "were"
+        if previous in BASE_VERB_TRIGGERS or previous in COMPOUND_SUBJECT_WORDS:
+            continue
+        if verb.lower() == "were" and previous in SUBJUNCTIVE_TRIGGERS:
+            continue
+        corrections.append(Correction(
+            "subject-verb agreement", match.group(0), f"{subject} {fixed}",
+            f"With '{subject}', use '{fixed}'.", match.start(), match.end()
+        ))
+
+    for match in THIRD_PERSON_PATTERN.finditer(text):
+        subject, verb = match.group(1), match.group(2)
+        previous = _previous_word(text, match.start())
+        lowered = verb.lower()
+        if lowered not in COMMON_VERBS or previous in BASE_VERB_TRIGGERS or previous in COMPOUND_SUBJECT_WORDS:
+            continue
+        # "read" may be the past tense, and "it like" is usually an object before the preposition "like"
+        if IRREGULAR_VERBS.get(lowered, ("",))[0] == lowered or (subject.lower() == "it" and lowered == "like"):
+            continue
+        if _after_mandative_verb(text, match.start()):
+            continue
+        fixed = _third_person(lowered)
+        corrections.append(Correction(
+            "subject-verb agreement", match.group(0), f"{subject} {fixed}",
+            f"With '{subject}' in the present simple, add -s: '{fixed}'.", match.start(), match.end()
+        ))
+
+    for match in ARTICLE_PATTERN.finditer(text):
+        article, word = match.group(1), match.group(2).lower()
+        # Acronyms and single letters take the article of their letter names ("an MBA", "an X-ray", "a U-turn")
+        if len(word) == 1 or match.group(2).isupper():
+            continue
+        vowel_sound = (word[0] in "aeiou" and not word.startswith(A_EXCEPTIONS_PREFIXES)) \
+            or word.startswith(AN_EXCEPTIONS_PREFIXES)
+        expected = "an" if vowel_sound else "a"
+        if article.lower() != expected:
+            corrections.append(Correction(
+                "article", match.group(0), f"{_match_case(article, expected)} {match.group(2)}",
+                f"Use '{expected}' before a word starting with a {'vowel' if vowel_sound else 'consonant'} sound.",
+                match.start(), match.end()
+            ))
+
+    return sorted(corrections, key=lambda c: c.start)
+
+
+def format_feedback(corrections: List[Correction]) -> str:
+    """Render corrections as the bullet list shown in the analysis box, once per distinct mistake."""
+    seen = set()
+    lines = []
+    for c in corrections:
+        key = (c.original.lower(), c.correction.lower())
+        if key not in seen:
+            seen.add(key)
+            lines.append(f"- **{c.original}** → **{c.correction}** ({c.category}): {c.explanation}")
+    return "\n".join(lines)
+
+
+class FastPathStats:
+    """Thread-safe counters for how often the local checker shrank an API call."""
+
+    def __init__(self):
+        self.checked = 0
+        self.calls_shrunk = 0
+        self._lock = threading.Lock()
+
+    def count(self, shrunk: bool = False):
+        with self._lock:
+            self.checked += 1
+            self.calls_shrunk += int(shrunk)
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "calls_shrunk": self.calls_shrunk,
+                "shrunk_rate": self.calls_shrunk / self.checked if self.checked else 0.0
+            }
+
+
+fast_path_stats = FastPathStats()
@@ -0,0 +1,258 @@
+"""
+Latency, token and cost instrumentation for LLM calls.
+
+Every call made by EnglishTeacher is recorded here, labelled by call kind
+(reply, analysis, summary), learning mode, level and model. The data is
+available as a Prometheus text exposition (HTTP endpoint and/or file) and as
+percentile rows for the admin panel in app.py.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from config import Config
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Return the q-quantile of already sorted values (nearest rank)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the cost in USD of a call from Config.MODEL_PRICES (per 1K tokens)."""
+    input_price, output_price = Config.MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1000.0
+
+
+def cached_prompt_tokens(usage) -> int:
+    """Return the prompt tokens the provider served from its prompt cache, if reported."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+class CallStats:
+    """Counters and a sliding window of latency samples for one label set."""
+
+    def __init__(self, window: int):
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.fallbacks = 0
+        self.collapsed = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.latency_sum = 0.0
+        self.ttft_sum = 0.0
+        self.ttft_count = 0
+        self.latencies = deque(maxlen=window)
+        self.ttfts = deque(maxlen=window)
+
+
+class MetricsRegistry:
+    """Thread-safe store of per-call metrics."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stats: Dict[tuple, CallStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, call: str, mode: str, level: str, model: str, seconds: float,
+               ttft: Optional[float] = None, prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0,
+               cache_hit: bool = False, error: bool = False, fallback: bool = False, collapsed: bool = False):
+        """
+        Record one finished call.
+        
+        model is the model that served it, or would have for a cache hit; ttft is
+        only given for streamed calls; fallback marks a fallback model of the
+        route and collapsed a call that shared an identical in-flight request.
+        """
+        key = (call, mode, level, model)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = CallStats(self.window)
+
+            stats.requests += 1
+            stats.errors += int(error)
+            stats.cache_hits += int(cache_hit)
+            stats.fallbacks += int(fallback)
+            stats.collapsed += int(collapsed)
+            stats.prompt_tokens += prompt_tokens
+            stats.cached_tokens += cached_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost += estimate_cost(model, prompt_tokens, completion_tokens)
+            stats.latency_sum += seconds
+            stats.latencies.append(seconds)
+            if ttft is not None:
+                stats.ttft_sum += ttft
+                stats.ttft_count += 1
+                stats.ttfts.append(ttft)
+
+    def reset(self):
+        """Drop everything recorded so far."""
+        with self._lock:
+            self._stats.clear()
+
+    def summary(self, group_by: tuple = ("call",)) -> List[Dict]:
+        """
+        Aggregate the recorded calls for display.
+
+        Args:
+            group_by: Label names to group rows by (call, mode, level, model)
+
+        Returns:
+            One dictionary per group with counters and p50/p95/p99 latency and TTFT
+        """
+        label_names = ("call", "mode", "level", "model")
+        groups: Dict[tuple, Dict] = {}
+        with self._lock:
+            for key, stats in self._stats.items():
+                labels = dict(zip(label_names, key))
+                group_key = tuple(labels[name] for name in group_by)
+                group = groups.setdefault(group_key, {
+                    "labels": dict(zip(group_by, group_key)),
+                    "requests": 0, "errors": 0, "cache_hits": 0, "fallbacks": 0, "collapsed": 0,
+                    "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost": 0.0,
+                    "latencies": [], "ttfts": []
+                })
+                group["requests"] += stats.requests
+                group["errors"] += stats.errors
+                group["cache_hits"] += stats.cache_hits
+                group["fallbacks"] += stats.fallbacks
+                group["collapsed"] += stats.collapsed
+                group["prompt_tokens"] += stats.prompt_tokens
+                group["cached_tokens"] += stats.cached_tokens
+                group["completion_tokens"] += stats.completion_tokens
+                group["cost"] += stats.cost
+                group["latencies"].extend(stats.latencies)
+                group["ttfts"].extend(stats.ttfts)
+
+        rows = []
+        for group in groups.values():
+            latencies = sorted(group.pop("latencies"))
+            ttfts = sorted(group.pop("ttfts"))
+            row = group.pop("labels")
+            row.update(group)
+            for q in QUANTILES:
+                row[f"p{int(q * 100)}_seconds"] = percentile(latencies, q)
+                row[f"p{int(q * 100)}_ttft_seconds"] = percentile(ttfts, q)
+            rows.append(row)
+        return sorted(rows, key=lambda row: tuple(str(row[name]) for name in group_by))
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        counters = [
+            ("requests_total", "LLM calls made or served from cache", "requests"),
+            ("errors_total", "LLM calls that failed", "errors"),
+            ("cache_hits_total", "LLM calls served from cache", "cache_hits"),
+            ("fallbacks_total", "LLM calls served by a fallback model of their route", "fallbacks"),
+            ("collapsed_total", "LLM calls that shared an identical in-flight request", "collapsed"),
+            ("prompt_tokens_total", "Prompt tokens billed", "prompt_tokens"),
+            ("cached_prompt_tokens_total", "Prompt tokens served from the provider's prompt cache", "cached_tokens"),
+            ("completion_tokens_total", "Completion tokens billed", "completion_tokens"),
+            ("cost_usd_total", "Estimated cost in USD", "cost"),
+        ]
+
+        with self._lock:
+            items = [(key, stats, sorted(stats.latencies), sorted(stats.ttfts)) for key, stats in self._stats.items()]
+
+        lines = []
+        for name, help_text, attribute in counters:
+            lines.append(f"# HELP english_teacher_llm_{name} {help_text}")
+            lines.append(f"# TYPE english_teacher_llm_{name} counter")
+            for key, stats, _, _ in items:
+                lines.append(f"english_teacher_llm_{name}{{{_format_labels(key)}}} {getattr(stats, attribute):g}")
+
+        lines.append("# HELP english_teacher_llm_latency_seconds Wall time of LLM calls")
+        lines.append("# TYPE english_teacher_llm_latency_seconds summary")
+        for key, stats, latencies, _ in items:
+            for q in QUANTILES:
+                lines.append(f"english_teacher_llm_latency_seconds{{{_format_labels(key)},quantile=\"{q}\"}} {percentile(latencies, q):.6f}")
+            lines.append(f"english_teacher_llm_latency_seconds_sum{{{_format_labels(key)}}} {stats.latency_sum:.6f}")
+            lines.append(f"english_teacher_llm_latency_seconds_count{{{_format_labels(key)}}} {stats.requests}")
+
+        lines.append("# HELP english_teacher_llm_ttft_seconds Time to first token of LLM calls")
+        lines.append("# TYPE english_teacher_llm_ttft_seconds summary")
+        for key, stats, _, ttfts in items:
+            for q in QUANTILES:
+                lines.append(f"english_teacher_llm_ttft_seconds{{{_format_labels(key)},quantile=\"{q}\"}} {percentile(ttfts, q):.6f}")
+            lines.append(f"english_teacher_llm_ttft_seconds_sum{{{_format_labels(key)}}} {stats.ttft_sum:.6f}")
+            lines.append(f"english_teacher_llm_ttft_seconds_count{{{_format_labels(key)}}} {stats.ttft_count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: tuple) -> str:
+    call, mode, level, model = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in key)
+    return f'call="{call}",mode="{mode}",level="{level}",model="{model}"'
+
+
+# Process-wide registry shared by every teacher instance
+registry = MetricsRegistry(window=Config.METRICS_WINDOW)
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrapes out of the app's console
+
+
+def _write_metrics_file(path: str, interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(registry.to_prometheus())
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass  # Try again on the next tick
+
+
+def start_exporters():
+    """
+    Start the configured exporters once per process.
+
+    METRICS_PORT serves /metrics over HTTP on METRICS_HOST; METRICS_FILE is rewritten every
+    METRICS_FILE_INTERVAL seconds for the node exporter's textfile collector.
+    """
+    global _exporters_started
+
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+        if Config.METRICS_PORT:
+            server = ThreadingHTTPServer((Config.METRICS_HOST, Config.METRICS_PORT), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+
+        if Config.METRICS_FILE:
+            threading.Thread(
+                target=_write_metrics_file, args=(Config.METRICS_FILE, Config.METRICS_FILE_INTERVAL),
+                name="metrics-file", daemon=True
+            ).start()
@@ -0,0 +1,201 @@
+"""
+Index of the mistakes found in students' analyses.
+
+The feedback of every recorded turn is parsed into structured mistake
+records (category, original, correction, timestamp). Each record is
+appended to a log, and per-student counters are updated in the same
+transaction, so progress views and "most frequent mistakes" read a few
+index entries instead of rescanning a student's history.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from config import Config
+
+# A mistake line such as "**have went** → **went** (tense)" or "'buyed' -> 'bought'".
+# Single quotes only delimit a term outside words, so "'She don't'" keeps its apostrophe.
+TERM = (r"""(?:\*\*([^*\n]{1,80}?)\*\*|"([^"\n]{1,80}?)"|“([^”\n]{1,80}?)”|"""
+        r"""(?<!\w)'((?:[^'\n]|(?<=\w)'(?=\w)){1,80}?)'(?!\w))""")
+MISTAKE_PATTERN = re.compile(
+    TERM + r"\s*(?:->|→|=>|should be)\s*" + TERM + r"(?:\s*\(([^)\n]{1,30})\))?",
+    re.IGNORECASE
+)
+
+
+class Mistake(NamedTuple):
+    category: str
+    original: str
+    correction: str
+    timestamp: float
+
+
+def parse_feedback(feedback: str, default_category: str, timestamp: Optional[float] = None) -> List[Mistake]:
+    """
+    Extract the corrections listed in analysis feedback.
+
+    Recognizes the local grammar rules' format as well as the usual ways the
+    model writes a correction ("X" -> "Y", 'X' → 'Y', **X** should be **Y**).
+    Lines without a recognizable correction are ignored.
+
+    Args:
+        feedback: Feedback text of an analysis
+        default_category: Category used when the line does not name one
+        timestamp: Time of the exchange (default: now)
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    mistakes = []
+    seen = set()
+    for match in MISTAKE_PATTERN.finditer(feedback):
+        original = next(group for group in match.groups()[0:4] if group is not None).strip()
+        correction = next(group for group in match.groups()[4:8] if group is not None).strip()
+        category = (match.group(9) or default_category).strip().lower()
+        key = (original.lower(), correction.lower())
+        if original and correction and key[0] != key[1] and key not in seen:
+            seen.add(key)
+            mistakes.append(Mistake(category, original, correction, timestamp))
+    return mistakes
+
+
+class MistakeIndex:
+    """Thread-safe SQLite index of mistakes and per-student counters."""
+
+    def __init__(self, path: str = ":memory:"):
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS mistakes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    student_id TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    original TEXT NOT NULL,
+                    correction TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS mistakes_student ON mistakes (student_id, id);
+
+                CREATE TABLE IF NOT EXISTS mistake_counts (
+                    student_id TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    original_key TEXT NOT NULL,
+                    original TEXT NOT NULL,
+                    correction TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    last_seen REAL NOT NULL,
+                    PRIMARY KEY (student_id, category, original_key)
+                );
+                CREATE INDEX IF NOT EXISTS mistake_counts_top ON mistake_counts (student_id, count DESC, last_seen DESC);
+
+                CREATE TABLE IF NOT EXISTS student_counters (
+                    student_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value INTEGER NOT NULL,
+                    PRIMARY KEY (student_id, name)
+                );
+            """)
+            self._db.commit()
+
+    def record(self, student_id: str, session_id: str, mode: str, feedback: str) -> List[Mistake]:
+        """Count one exchange of a student and index the mistakes in its feedback."""
+        mistakes = parse_feedback(feedback or "", default_category=mode)
+        counters = {"exchanges": 1, f"exchanges:{mode}": 1}
+        if mistakes:
+            counters["mistakes"] = len(mistakes)
+        for mistake in mistakes:
+            counters[f"mistakes:{mistake.category}"] = counters.get(f"mistakes:{mistake.category}", 0) + 1
+
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO mistakes (student_id, session_id, mode, category, original, correction, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(student_id, session_id, mode, m.category, m.original, m.correction, m.timestamp) for m in mistakes]
+            )
+            self._db.executemany(
+                "INSERT INTO mistake_counts (student_id, category, original_key, original, correction, count, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (student_id, category, original_key) DO UPDATE SET "
+                "count = count + 1, correction = excluded.correction, last_seen = excluded.last_seen",
+                [(student_id, m.category, m.original.lower(), m.original, m.correction, m.timestamp) for m in mistakes]
+            )
+            self._db.executemany(
+                "INSERT INTO student_counters (student_id, name, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (student_id, name) DO UPDATE SET value = value + excluded.value",
+                [(student_id, name, value) for name, value in counters.items()]
+            )
+            self._db.commit()
+        return mistakes
+
+    def progress(self, student_id: str) -> Dict:
+        """
+        Return a student's counters.
+
+        Returns:
+            Dictionary with the total exchanges and mistakes, and both broken
+            down by mode and by mistake category
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, value FROM student_counters WHERE student_id = ?", (student_id,)
+            ).fetchall()
+
+        progress = {"exchanges": 0, "mistakes": 0, "by_mode": {}, "by_category": {}}
+        for name, value in rows:
+            total, _, detail = name.partition(":")
+            if not detail:
+                progress[total] = value
+            elif total == "exchanges":
+                progress["by_mode"][detail] = value
+            else:
+                progress["by_category"][detail] = value
+        return progress
+
+    def frequent_mistakes(self, student_id: str, limit: int = 5) -> List[Dict]:
+        """Return a student's most repeated mistakes, most frequent first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT category, original, correction, count, last_seen FROM mistake_counts "
+                "WHERE student_id = ? ORDER BY count DESC, last_seen DESC LIMIT ?",
+                (student_id, limit)
+            ).fetchall()
+        return [{"category": row[0], "original": row[1], "correction": row[2], "count": row[3], "last_seen": row[4]}
+                for row in rows]
+
+    def recent_mistakes(self, student_id: str, limit: int = 10) -> List[Dict]:
+        """Return a student's latest mistake records, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT category, original, correction, mode, created_at FROM mistakes "
+                "WHERE student_id = ? ORDER BY id DESC LIMIT ?",
+                (student_id, limit)
+            ).fetchall()
+        return [{"category": row[0], "original": row[1], "correction": row[2], "mode": row[3], "timestamp": row[4]}
+                for row in rows]
+
+
+_shared_index: Optional[MistakeIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_mistake_index() -> MistakeIndex:
+    """Return the process-wide index in the conversation database, creating it on first use."""
+    global _shared_index
+
+    if _shared_index is None:
+        with _shared_index_lock:
+            if _shared_index is None:
+                _shared_index = MistakeIndex(Config.CONVERSATION_DB_PATH or ":memory:")
+    return _shared_index
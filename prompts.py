@@ -0,0 +1,86 @@
+"""
+Prompt registry built once at import.
+
+Every system prompt the teacher sends, for each (call kind, mode, level)
+combination of Config.MODES and Config.LEVELS, is assembled and
+whitespace-normalized here a single time. Identical requests therefore
+start with byte-identical system prefixes, ordered from the most shared
+text (the teacher persona) to the most specific (mode, level), which is
+what provider-side prompt caching matches on. Each prompt carries a short
+version hash of its text so results, caches and metrics can tell prompt
+revisions apart.
+"""
+
+import hashlib
+import re
+import textwrap
+from typing import Dict, NamedTuple, Tuple
+
+from config import Config
+
+CALL_KINDS = ("reply", "structured", "analysis", "summary")
+
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+
+
+class Prompt(NamedTuple):
+    text: str
+    version: str
+
+
+def normalize_prompt(text: str) -> str:
+    """Remove common indentation, trailing spaces and repeated blank lines."""
+    lines = [line.rstrip() for line in textwrap.dedent(text).strip().splitlines()]
+    return BLANK_LINES_PATTERN.sub("\n\n", "\n".join(lines))
+
+
+def prompt_version(text: str) -> str:
+    """Return a short, stable hash identifying a prompt's exact text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def build_prompt(call: str, mode: str, level: str) -> str:
+    """Assemble the system prompt for one call kind, mode and level."""
+    if call == "analysis":
+        return normalize_prompt(Config.ANALYSIS_SYSTEM_PROMPT + "\n\n" + Config.ANALYSIS_PROMPTS[mode])
+    if call == "summary":
+        return normalize_prompt(Config.SUMMARY_SYSTEM_PROMPT)
+
+    parts = [
+        Config.TEACHER_SYSTEM_PROMPT,
+        f"Mode: {Config.MODES[mode]}\n{Config.LEVEL_CONTEXT[level]}\n{Config.MODE_INSTRUCTIONS[mode]}"
+    ]
+    if call == "structured":
+        parts.append(Config.STRUCTURED_RESPONSE_PROMPT.format(analysis_prompt=Config.ANALYSIS_PROMPTS[mode]))
+    return normalize_prompt("\n\n".join(normalize_prompt(part) for part in parts))
+
+
+class PromptRegistry:
+    """Precompiled prompts keyed by (call kind, mode, level)."""
+
+    def __init__(self):
+        self._prompts: Dict[Tuple[str, str, str], Prompt] = {}
+        for call in CALL_KINDS:
+            for mode in Config.MODES:
+                for level in Config.LEVELS:
+                    text = build_prompt(call, mode, level)
+                    self._prompts[(call, mode, level)] = Prompt(text, prompt_version(text))
+
+        # One hash for the whole prompt set, e.g. for logs and dashboards
+        self.version = prompt_version("\n".join(prompt.version for prompt in self._prompts.values()))
+
+    def get(self, call: str, mode: str = "conversation", level: str = "intermediate") -> Prompt:
+        """Return the prompt; unknown modes and levels fall back to conversation and intermediate."""
+        prompt = self._prompts.get((call, mode, level))
+        if prompt is None:
+            mode = mode if mode in Config.MODES else "conversation"
+            level = level if level in Config.LEVELS else "intermediate"
+            prompt = self._prompts[(call, mode, level)]
+        return prompt
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+
+# Built once per process
+prompt_registry = PromptRegistry()
@@ -3,23 +3,91 @@
 English Teacher Agent - Main Runner Script
 """
 
-import subprocess
+import argparse
+import importlib.util
 import sys
-import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+# Importable module -> package to install
+REQUIRED_PACKAGES = {
+    "streamlit": "streamlit",
+    "openai": "openai",
+    "dotenv": "python-dotenv",
+    "httpx": "httpx",
+    "numpy": "numpy"
+}
+
+class StartupTimer:
+    """Time the launcher's startup phases and print each as it finishes."""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+    
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block; a "detail" set on the yielded dict is printed with it."""
+        started = time.perf_counter()
+        info = {}
+        yield info
+        elapsed = (time.perf_counter() - started) * 1000
+        detail = f" ({info['detail']})" if info.get("detail") else ""
+        print(f"⏱️  {name}: {elapsed:.0f} ms{detail}")
+    
+    def report(self):
+        print(f"✅ Warm-up finished in {(time.perf_counter() - self.started) * 1000:.0f} ms")
+
 def check_requirements():
-    """Check if required packages are installed."""
-    try:
-        import streamlit
-        import openai
-        import dotenv
-        print("✅ All required packages are installed.")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing required package: {e}")
+    """Check if required packages are installed, without importing them."""
+    missing = [package for module, package in REQUIRED_PACKAGES.items()
+               if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f"❌ Missing required packages: {', '.join(missing)}")
         print("Please install requirements: pip install -r requirements.txt")
         return False
+    
+    print("✅ All required packages are installed.")
+    return True
+
+def warm_up(timer, sync_client=True):
+    """
+    Load the teacher before the app accepts traffic, so the first student
+    does not pay for imports, client setup or the API connection.
+    
+    Args:
+        timer: StartupTimer the phases are reported to
+        sync_client: Create the blocking client and connect it; the API
+            server connects its async client on its own event loop instead
+    """
+    with timer.phase("configuration"):
+        from config import Config
+    
+    with timer.phase("prompt registry") as phase:
+        from prompts import prompt_registry
+        phase["detail"] = f"{len(prompt_registry)} prompts, version {prompt_registry.version}"
+    
+    with timer.phase("teacher modules"):
+        import english_teacher
+    
+    if Config.WARM_UP_CACHE and Config.CACHE_ENABLED and Config.CACHE_PATH:
+        with timer.phase("response cache") as phase:
+            phase["detail"] = f"{english_teacher.response_cache.preload()} entries loaded"
+    
+    if not sync_client:
+        return
+    
+    with timer.phase("OpenAI client") as phase:
+        try:
+            english_teacher.get_shared_client()
+        except ValueError as e:
+            phase["detail"] = str(e)
+            return
+    
+    if Config.WARM_UP_CONNECTION:
+        with timer.phase("API connection") as phase:
+            if not english_teacher.warm_up_connection():
+                phase["detail"] = "unreachable, connecting on the first request"
 
 def check_env_file():
     """Check if .env file exists and has API key."""
@@ -40,8 +108,55 @@ def check_env_file():
     print("✅ Environment configuration looks good.")
     return True
 
+def parse_args(argv=None):
+    """Parse the command line; without a subcommand the Streamlit app is started."""
+    parser = argparse.ArgumentParser(description="English Teacher Agent")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    batch = subparsers.add_parser("batch", help="Grade a JSONL file of submissions offline")
+    batch.add_argument("input", help="JSONL file with one {id, text, mode, level} record per line")
+    batch.add_argument("output", help="JSONL file the results are appended to (used to resume)")
+    batch.add_argument("--workers", type=int, default=8, help="Number of concurrent requests (default: 8)")
+    batch.add_argument("--rpm", type=float, default=500, help="Maximum requests per minute (default: 500)")
+    batch.add_argument("--tpm", type=float, default=0, help="Maximum tokens per minute (default: no limit)")
+    
+    serve = subparsers.add_parser("serve", help="Serve the teacher over an HTTP/JSON API")
+    serve.add_argument("--host", default=None, help="Address to listen on (default: ENGLISH_TEACHER_API_HOST or 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=None, help="Port to listen on (default: ENGLISH_TEACHER_API_PORT or 8000)")
+    
+    return parser.parse_args(argv)
+
+def run_batch(args):
+    """Run the offline batch grader."""
+    if not check_requirements():
+        sys.exit(1)
+    
+    import batch_grader
+    sys.exit(batch_grader.main(args))
+
+def run_server(args):
+    """Run the asyncio HTTP API server."""
+    if not check_requirements():
+        sys.exit(1)
+    
+    timer = StartupTimer()
+    warm_up(timer, sync_client=False)
+    timer.report()
+    
+    from config import Config
+    import api_server
+    args.host = args.host or Config.API_HOST
+    args.port = args.port or Config.API_PORT
+    sys.exit(api_server.main(args))
+
 def main():
     """Main function to run the English Teacher Agent."""
+    args = parse_args()
+    if args.command == "batch":
+        run_batch(args)
+    if args.command == "serve":
+        run_server(args)
+    
     print("🚀 Starting English Teacher Agent...")
     print("=" * 50)
     
@@ -57,18 +172,26 @@ def main():
         print("3. Run this script again")
         #sys.exit(1)
     
+    print("\n🔥 Warming up...")
+    timer = StartupTimer()
+    warm_up(timer)
+    with timer.phase("Streamlit"):
+        from streamlit.web import cli as streamlit_cli
+    timer.report()
+    
     print("\n🌐 Starting Streamlit app...")
     print("The app will open in your default browser.")
     print("Press Ctrl+C to stop the server.")
     print("=" * 50)
     
     try:
-        # Run streamlit app
-        subprocess.run([
-            sys.executable, "-m", "streamlit", "run", "app.py",
+        # Run Streamlit in this process, so the app reuses the warmed-up
+        # modules, client and connection pool
+        streamlit_cli.main([
+            "run", "app.py",
             "--server.port", "8501",
             "--server.address", "localhost"
-        ])
+        ], prog_name="streamlit")
     except KeyboardInterrupt:
         print("\n👋 English Teacher Agent stopped. Goodbye!")
     except Exception as e:
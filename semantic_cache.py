@@ -0,0 +1,173 @@
+"""
+Near-duplicate cache for stateless analysis requests.
+
+Texts are embedded locally as hashed word and character trigram vectors,
+so submissions that differ only in casing, punctuation or a word or two
+land close together. A lookup is a nearest-neighbour search over a
+fixed-size in-memory matrix of the cached vectors; no API call or model
+download is involved. Since a single changed word is often the mistake
+being analyzed, a neighbour is only served when the texts have the same
+words apart from proper nouns.
+"""
+
+import hashlib
+import re
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from config import Config
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+CAPITALIZED_PATTERN = re.compile(r"(?<![A-Za-z0-9'])[A-Z][a-z]+(?:'[a-z]+)*")
+SENTENCE_END_PATTERN = re.compile(r"(?:^|[.!?:\n\"])\W*$")
+
+# Neighbours above the threshold that are checked before giving up
+MAX_CANDIDATES = 3
+
+
+def tokenize(text: str) -> list:
+    """Lowercase words of text, without punctuation."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def proper_nouns(text: str) -> Set[str]:
+    """Lowercased capitalized words of text that do not start a sentence, such as names and places."""
+    return {
+        match.group(0).lower() for match in CAPITALIZED_PATTERN.finditer(text)
+        if not SENTENCE_END_PATTERN.search(text, 0, match.start())
+    }
+
+
+def embed(text: str, dim: int = 512) -> np.ndarray:
+    """
+    Return the L2-normalized hashed n-gram vector of text.
+
+    Features are the words and the character trigrams of the normalized
+    text; each is hashed to a signed bucket so collisions tend to cancel.
+    """
+    words = tokenize(text)
+    padded = f" {' '.join(words)} "
+    features = [f"w:{word}" for word in words] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    vector = np.zeros(dim, dtype=np.float32)
+    if not words:
+        return vector
+
+    hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features),
+                         dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Thread-safe similarity cache over a fixed number of slots.
+
+    Entries are grouped by namespace (model, prompt version and request
+    instructions) and only match within their namespace. A neighbour is
+    only served when the two texts have the same words in the same order,
+    ignoring casing and punctuation, except for proper nouns that its
+    feedback does not mention. "She like coffee" never gets the cached
+    analysis of "She likes coffee". When the cache is full, expired
+    entries are replaced first, then the least recently used.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 86400, dim: int = 512):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._namespaces = np.full(max_entries, -1, dtype=np.int64)
+        self._expires_at = np.zeros(max_entries)
+        self._last_used = np.zeros(max_entries)
+        self._entries = [None] * max_entries  # slot -> (words, proper nouns, value)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _namespace_id(namespace: str) -> int:
+        return int.from_bytes(hashlib.blake2b(namespace.encode("utf-8"), digest_size=7).digest(), "big")
+
+    def get(self, namespace: str, text: str, threshold: float) -> Optional[Dict]:
+        """Return the value cached for the nearest text above threshold, or None on a miss."""
+        vector = embed(text, self.dim)
+        words = tokenize(text)
+        names = proper_nouns(text)
+        namespace_id = self._namespace_id(namespace)
+        now = time.time()
+
+        with self._lock:
+            scores = self._vectors @ vector
+            scores[(self._namespaces != namespace_id) | (self._expires_at <= now)] = -1.0
+            candidates = np.flatnonzero(scores >= threshold)
+            for slot in candidates[np.argsort(-scores[candidates])][:MAX_CANDIDATES]:
+                cached_words, cached_names, value = self._entries[slot]
+                if self._applies(words, names, cached_words, cached_names, value):
+                    self._last_used[slot] = now
+                    self.hits += 1
+                    return dict(value)
+
+            self.misses += 1
+            return None
+
+    def set(self, namespace: str, text: str, value: Dict):
+        """Store value for text, replacing an expired or the least recently used entry if full."""
+        vector = embed(text, self.dim)
+        if not vector.any():
+            return
+
+        now = time.time()
+        with self._lock:
+            slot = int(np.argmin(np.where(self._expires_at <= now, -np.inf, self._last_used)))
+            self._vectors[slot] = vector
+            self._namespaces[slot] = self._namespace_id(namespace)
+            self._expires_at[slot] = now + self.ttl
+            self._last_used[slot] = now
+            self._entries[slot] = (tuple(tokenize(text)), frozenset(proper_nouns(text)), value)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._namespaces[:] = -1
+            self._expires_at[:] = 0
+            self._entries = [None] * self.max_entries
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the number of live entries."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": int(np.count_nonzero(self._expires_at > time.time()))
+            }
+
+    @staticmethod
+    def _applies(words: List[str], names: Set[str], cached_words: Tuple[str, ...],
+                 cached_names: frozenset, value: Dict) -> bool:
+        """Whether the texts differ only in proper nouns that the cached feedback does not mention."""
+        if len(words) != len(cached_words):
+            return False
+        changed = set()
+        for word, cached_word in zip(words, cached_words):
+            if word != cached_word:
+                if word not in names or cached_word not in cached_names:
+                    return False
+                changed.update((word, cached_word))
+        return not changed.intersection(tokenize(value.get("feedback", "")))
+
+
+# Process-wide cache shared by every teacher instance
+semantic_cache = SemanticCache(
+    max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=Config.CACHE_TTL,
+    dim=Config.SEMANTIC_CACHE_DIM
+)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Keep the suite off the real databases; Config reads these at import time
+os.environ["ENGLISH_TEACHER_CONVERSATION_DB"] = ":memory:"
+os.environ["ENGLISH_TEACHER_CACHE_PATH"] = ""
+os.environ.setdefault("ENGLISH_TEACHER_RATE_LIMIT_RPM", "0")
+os.environ.setdefault("ENGLISH_TEACHER_RATE_LIMIT_TPM", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
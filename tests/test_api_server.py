@@ -0,0 +1,87 @@
+import asyncio
+import json
+import sqlite3
+
+from api_server import SessionManager, TeacherServer
+from async_teacher import AsyncSingleFlight
+
+
+class FailingServer(TeacherServer):
+    async def route(self, request, writer):
+        if request.path == "/health":
+            return 200, {"status": "ok"}
+        raise sqlite3.OperationalError("database is locked")
+
+
+async def exchange(raw: bytes) -> bytes:
+    listener = await asyncio.start_server(FailingServer().handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+
+
+def parse(response: bytes):
+    head, _, body = response.partition(b"\r\n\r\n")
+    return head.split(b"\r\n")[0].decode(), head.decode(), body
+
+
+def test_unexpected_error_is_answered_with_500_and_closes():
+    response = asyncio.run(exchange(b"GET /sessions/abc/summary HTTP/1.1\r\n\r\n"
+                                    b"GET /health HTTP/1.1\r\n\r\n"))
+    status, head, body = parse(response)
+    
+    assert status == "HTTP/1.1 500 Internal Server Error"
+    assert "Connection: close" in head
+    assert json.loads(body) == {"error": "Internal server error"}
+
+
+def test_chunked_body_is_rejected_and_closes():
+    response = asyncio.run(exchange(b"POST /sessions HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+                                    b"GET /health HTTP/1.1\r\n\r\n"))
+    status, head, body = parse(response)
+    
+    assert status == "HTTP/1.1 411 Length Required"
+    assert "Connection: close" in head
+    assert b"HTTP/1.1 200" not in body
+
+
+def test_overlong_request_line_is_answered():
+    response = asyncio.run(exchange(b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n"))
+    
+    assert parse(response)[0].startswith("HTTP/1.1 414 ")
+
+
+def test_eviction_skips_sessions_with_a_turn_in_flight():
+    async def scenario():
+        sessions = SessionManager(max_sessions=1, ttl=3600)
+        busy = sessions.get("busy")
+        async with busy.lock:
+            sessions.get("other")
+            assert sessions.get("busy") is busy
+        sessions.get("third")
+        return len(sessions)
+    
+    assert asyncio.run(scenario()) == 1
+
+
+def test_waiter_cancelled_as_the_call_finishes_only_sees_its_cancellation():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        outcome = asyncio.get_running_loop().create_future()
+        
+        leader = asyncio.ensure_future(flight.do("key", lambda: outcome))
+        follower = asyncio.ensure_future(flight.do("key", lambda: outcome))
+        await asyncio.sleep(0)
+        
+        # The call is done, but the follower is cancelled before it wakes up
+        outcome.set_result("answer")
+        follower.cancel()
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+        return results[0], type(results[1])
+    
+    assert asyncio.run(scenario()) == (("answer", True), asyncio.CancelledError)
@@ -0,0 +1,57 @@
+import json
+
+import openai
+import pytest
+
+from batch_grader import run_batch
+from benchmark import StubSettings, start_stub_server
+
+
+@pytest.fixture
+def stub_client():
+    server = start_stub_server(StubSettings(latency=0.0, jitter=0.0, seed=1))
+    yield openai.OpenAI(api_key="stub-key", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+    server.shutdown()
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def read_results(path):
+    return {record["id"]: record for record in map(json.loads, path.read_text(encoding="utf-8").splitlines())}
+
+
+def test_bad_records_become_error_results_and_the_batch_goes_on(tmp_path, stub_client):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(input_path, [
+        json.dumps({"id": "ok", "text": "I have went home."}),
+        "[]",
+        '"just a string"',
+        "{not json",
+        json.dumps({"id": "bad-mode", "text": "Hello.", "mode": ["grammar"]}),
+        json.dumps({"text": "No id here."}),
+        json.dumps({"text": "No id either."}),
+    ])
+    
+    stats = run_batch(str(input_path), str(output_path), workers=2, requests_per_minute=0, client=stub_client)
+    results = read_results(output_path)
+    
+    assert stats == {"graded": 3, "failed": 4, "skipped": 0}
+    assert "feedback" in results["ok"]
+    assert results["line-2"]["error"] == "Each line must be a JSON object"
+    assert results["line-3"]["error"] == "Each line must be a JSON object"
+    assert results["line-4"]["error"].startswith("Invalid JSON")
+    assert results["bad-mode"]["error"].startswith("Grading failed")
+    assert "feedback" in results["line-6"] and "feedback" in results["line-7"]
+
+
+def test_rerun_skips_only_graded_ids(tmp_path, stub_client):
+    input_path, output_path = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_lines(input_path, [json.dumps({"text": "First text."}), json.dumps({"text": "Second text."})])
+    write_lines(output_path, [json.dumps({"id": "line-1", "feedback": "done"})])
+    
+    stats = run_batch(str(input_path), str(output_path), workers=2, requests_per_minute=0, client=stub_client)
+    
+    assert stats == {"graded": 1, "failed": 0, "skipped": 1}
+    assert set(read_results(output_path)) == {"line-1", "line-2"}
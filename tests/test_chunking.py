@@ -0,0 +1,80 @@
+from conversation_store import ConversationStore
+from english_teacher import EnglishTeacher, split_into_chunks
+from mistake_index import MistakeIndex
+
+MAX_CHARS = 1200
+
+
+def assert_bounded(text, chunks):
+    assert chunks
+    for start, end in chunks:
+        assert 0 < end - start <= MAX_CHARS
+    covered = " ".join(text[start:end] for start, end in chunks)
+    assert covered.split() == text.split()
+
+
+def test_trailing_sign_off_that_does_not_fit_gets_its_own_chunk():
+    paragraph = ("I am writing to tell you about my holiday in Lisbon. " * 23)[:1183]
+    text = paragraph + "\n\nBest regards,\nAna"
+    assert len(text) == 1202
+    
+    chunks = split_into_chunks(text, MAX_CHARS)
+    
+    assert_bounded(text, chunks)
+    assert text[chunks[-1][0]:chunks[-1][1]] == "Best regards,\nAna"
+
+
+def test_trailing_sign_off_that_fits_is_merged():
+    text = "A short letter about my week at school and my friends. " * 5 + "\n\nBest regards,\nAna"
+    
+    assert split_into_chunks(text, MAX_CHARS) == [(0, len(text))]
+
+
+def test_sentence_without_punctuation_is_split_between_words():
+    text = " ".join(["and then we went to the beach"] * 120)
+    
+    chunks = split_into_chunks(text, MAX_CHARS)
+    
+    assert len(chunks) > 1
+    assert_bounded(text, chunks)
+
+
+def test_space_between_two_unbroken_words_does_not_make_an_empty_chunk():
+    text = "x" * 1200 + " " + "y" * 1200
+    
+    assert split_into_chunks(text, MAX_CHARS) == [(0, 1200), (1201, 2401)]
+
+
+def make_teacher(**kwargs):
+    return EnglishTeacher(client=object(), store=ConversationStore(), mistakes=MistakeIndex(), **kwargs)
+
+
+def analyze_locally(teacher, text):
+    """Run the chunk bookkeeping of _analyze_in_chunks with a canned analysis per chunk."""
+    spans = split_into_chunks(text, MAX_CHARS)
+    previous = teacher._previous_revision()
+    pending = teacher._chunks_to_analyze(text, spans, previous)
+    return pending, teacher._merge_chunks(text, spans, {chunk: {"feedback": "ok"} for chunk in pending}, previous)
+
+
+DRAFT = "\n\n".join(f"Paragraph {number}. " + "This is a sentence about my holiday. " * 30 for number in range(3))
+
+
+def test_revision_only_analyzes_changed_chunks():
+    teacher = make_teacher()
+    analyze_locally(teacher, DRAFT)
+    
+    pending, result = analyze_locally(teacher, DRAFT.replace("Paragraph 1.", "Paragraph one."))
+    
+    assert len(pending) == 1
+    assert [chunk["reused"] for chunk in result["chunks"]] == [True, False, True]
+
+
+def test_batch_teacher_does_not_reuse_chunks_across_submissions():
+    teacher = make_teacher(reuse_revisions=False)
+    analyze_locally(teacher, DRAFT)
+    
+    pending, result = analyze_locally(teacher, DRAFT)
+    
+    assert len(pending) == 3
+    assert teacher._last_revision_chunks == {}
@@ -0,0 +1,48 @@
+from conversation_store import ConversationStore
+from english_teacher import ContextBuilder, EnglishTeacher, estimate_message_tokens
+from mistake_index import MistakeIndex
+
+
+def message(role, words):
+    return {"role": role, "content": " ".join(f"word{i}" for i in range(words))}
+
+
+def fixed_tokens():
+    return estimate_message_tokens({"role": "system", "content": "Teach."}) + estimate_message_tokens({"role": "user", "content": "Hi"})
+
+
+def test_newest_history_is_kept_within_the_budget():
+    history = [message("user", 50), message("assistant", 50), message("user", 50), message("assistant", 50)]
+    per_message = estimate_message_tokens(history[0])
+    fixed = fixed_tokens()
+
+    context = ContextBuilder(fixed + 2 * per_message).build("Teach.", history, "Hi")
+
+    assert context["history_messages"] == 2
+    assert context["messages"][1:3] == history[2:]
+    assert context["prompt_tokens"] <= fixed + 2 * per_message
+
+
+def test_oldest_fitting_message_is_truncated_to_its_tail():
+    history = [message("user", 200), message("assistant", 10)]
+    fixed = fixed_tokens()
+    budget = fixed + estimate_message_tokens(history[1]) + 100
+
+    context = ContextBuilder(budget).build("Teach.", history, "Hi")
+    truncated = context["messages"][1]
+
+    assert context["history_messages"] == 2
+    assert truncated["content"].startswith("...")
+    assert history[0]["content"].endswith(truncated["content"][3:])
+    assert context["prompt_tokens"] <= budget
+
+
+def test_summary_stands_in_for_dropped_exchanges():
+    teacher = EnglishTeacher(client=object(), store=ConversationStore(), mistakes=MistakeIndex())
+    teacher.conversation_history = [message("user", 3000), message("assistant", 3000)]
+    teacher.summary = "The student practised the past simple."
+
+    messages = teacher._build_messages("Hi", "conversation", "beginner")
+
+    assert "The student practised the past simple." in messages[0]["content"]
+    assert messages[1]["content"].startswith("...")  # Only the tail of the reply still fits
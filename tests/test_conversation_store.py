@@ -0,0 +1,30 @@
+from conversation_store import ConversationStore
+from english_teacher import EnglishTeacher
+from mistake_index import MistakeIndex
+
+
+def test_latest_pages_newest_first():
+    store = ConversationStore()
+    for number in range(5):
+        store.append("s1", f"question {number}", f"answer {number}", {"feedback": ""}, "conversation", "beginner")
+    store.append("s2", "other", "other", {}, "grammar", "advanced")
+    
+    assert store.count("s1") == 5
+    assert [e["user_input"] for e in store.latest("s1", 2, offset=1)] == ["question 3", "question 2"]
+    assert store.recent_messages("s1", 1) == [
+        {"role": "user", "content": "question 4"},
+        {"role": "assistant", "content": "answer 4"}
+    ]
+
+
+def test_session_keeps_its_student_when_rebuilt():
+    store = ConversationStore()
+    mistakes = MistakeIndex()
+    client = object()  # No request is sent
+    
+    EnglishTeacher(client=client, store=store, mistakes=mistakes, session_id="s1", student_id="ana")
+    rebuilt = EnglishTeacher(client=client, store=store, mistakes=mistakes, session_id="s1")
+    
+    assert rebuilt.student_id == "ana"
+    assert store.student_of("s1") == "ana"
+    assert EnglishTeacher(client=client, store=store, mistakes=mistakes, session_id="s2").student_id == "s2"
@@ -0,0 +1,53 @@
+import pytest
+
+from grammar_rules import check_grammar
+
+CORRECT_SENTENCES = [
+    "I've got a question.",
+    "I have got two brothers.",
+    "Does she have a car?",
+    "Did he have time?",
+    "Would it have helped?",
+    "I wish he were here.",
+    "If it were easy, everyone would do it.",
+    "She looks at it like a puzzle.",
+    "He read it like a pro.",
+    "He and she like pizza.",
+    "She and I are friends.",
+    "She has an MBA.",
+    "He watched a UFO documentary.",
+    "She has gone to an hour-long class.",
+    "They were late yesterday.",
+    "The doctor took an X-ray of my arm.",
+    "He made a U-turn on the bridge.",
+    "She moved to a U.S. city.",
+    "The road makes an S-curve.",
+    "Water is a utility.",
+    "It was a unanimous decision.",
+    "She plays a ukulele.",
+    "Phones are a ubiquitous tool.",
+    "A fork is a utensil.",
+    "He is an honorable man.",
+    "It was an uninteresting film.",
+    "I suggest he go home.",
+    "We insisted that she take a taxi.",
+]
+
+
+@pytest.mark.parametrize("sentence", CORRECT_SENTENCES)
+def test_correct_sentences_are_not_flagged(sentence):
+    assert check_grammar(sentence) == []
+
+
+@pytest.mark.parametrize("sentence, correction", [
+    ("She don't like coffee.", "She doesn't"),
+    ("He have two cats.", "He has"),
+    ("I buyed a new phone.", "bought"),
+    ("I have went there.", "have gone"),
+    ("Did you went home?", "Did you go"),
+    ("She like coffee.", "She likes"),
+    ("It is a apple.", "an apple"),
+    ("They was at home.", "They were"),
+])
+def test_common_mistakes_are_flagged(sentence, correction):
+    assert {c.correction for c in check_grammar(sentence)} == {correction}
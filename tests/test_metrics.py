@@ -0,0 +1,25 @@
+from metrics import MetricsRegistry
+
+
+def test_ttft_summary_has_sum_and_count():
+    registry = MetricsRegistry(window=8)
+    registry.record("reply", "conversation", "beginner", "gpt-4o-mini", 1.0, ttft=0.25)
+    registry.record("reply", "conversation", "beginner", "gpt-4o-mini", 2.0, ttft=0.5)
+
+    text = registry.to_prometheus()
+
+    labels = 'call="reply",mode="conversation",level="beginner",model="gpt-4o-mini"'
+    assert f"english_teacher_llm_ttft_seconds_sum{{{labels}}} 0.750000" in text
+    assert f"english_teacher_llm_ttft_seconds_count{{{labels}}} 2" in text
+
+
+def test_calls_without_ttft_are_left_out_of_ttft_percentiles():
+    registry = MetricsRegistry(window=8)
+    registry.record("analysis", "grammar", "beginner", "gpt-4o-mini", 3.0)
+    registry.record("analysis", "grammar", "beginner", "gpt-4o-mini", 0.001, cache_hit=True)
+
+    row, = registry.summary(group_by=("model",))
+
+    assert row["requests"] == 2
+    assert row["cache_hits"] == 1
+    assert row["p50_ttft_seconds"] == 0.0
@@ -0,0 +1,38 @@
+import pytest
+
+from mistake_index import MistakeIndex, parse_feedback
+
+
+@pytest.mark.parametrize("feedback, expected", [
+    ("- **have went** → **have gone** (verb form): Use the past participle.", ("verb form", "have went", "have gone")),
+    ('"buyed" -> "bought"', ("grammar", "buyed", "bought")),
+    ("“informations” should be “information”", ("grammar", "informations", "information")),
+    ("'She don't' → 'She doesn't'", ("grammar", "She don't", "She doesn't")),
+    ("'I didn't went' -> 'I didn't go' (tense)", ("tense", "I didn't went", "I didn't go")),
+])
+def test_parse_feedback_formats(feedback, expected):
+    mistakes = parse_feedback(feedback, "grammar", timestamp=1.0)
+    
+    assert [(m.category, m.original, m.correction) for m in mistakes] == [expected]
+
+
+def test_parse_feedback_ignores_lines_without_a_correction():
+    assert parse_feedback("Great job! Your sentence is correct. It's a 'nice' one.", "grammar") == []
+
+
+def test_counters_and_frequent_mistakes():
+    index = MistakeIndex()
+    index.record("ana", "s1", "grammar", "- **buyed** → **bought** (irregular verb): Use the irregular form.")
+    index.record("ana", "s2", "grammar", "'buyed' -> 'bought' (irregular verb)\n'She don't' -> 'She doesn't'")
+    index.record("ana", "s2", "conversation", "No mistakes found.")
+    index.record("bob", "s3", "grammar", "'buyed' -> 'bought'")
+    
+    progress = index.progress("ana")
+    frequent = index.frequent_mistakes("ana")
+    
+    assert progress["exchanges"] == 3
+    assert progress["mistakes"] == 3
+    assert progress["by_mode"] == {"grammar": 2, "conversation": 1}
+    assert progress["by_category"] == {"irregular verb": 2, "grammar": 1}
+    assert [(m["original"], m["count"]) for m in frequent] == [("buyed", 2), ("She don't", 1)]
+    assert index.progress("bob")["mistakes"] == 1
@@ -0,0 +1,12 @@
+import pytest
+
+from config import Config
+
+
+@pytest.mark.parametrize("call", ["reply", "analysis", "summary"])
+@pytest.mark.parametrize("mode", list(Config.MODE_DESCRIPTIONS))
+@pytest.mark.parametrize("input_chars", [10, 300, 500, 800, 5000])
+def test_every_call_has_a_fallback_model(call, mode, input_chars):
+    models = Config.get_models(call, mode, "intermediate", input_chars)
+    
+    assert len(models) >= 2
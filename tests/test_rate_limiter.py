@@ -0,0 +1,135 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import english_teacher
+from config import Config
+from conversation_store import ConversationStore
+from english_teacher import EnglishTeacher, QueueFullError, RateLimiter, get_retry_after
+from mistake_index import MistakeIndex
+
+REQUEST = httpx.Request("POST", "http://stub/v1/chat/completions")
+LABELS = ("reply", "conversation", "beginner")
+
+
+def drained_limiter(requests_per_minute=600, **kwargs):
+    """Return a limiter whose one second of burst capacity is used up."""
+    limiter = RateLimiter(requests_per_minute=requests_per_minute, **kwargs)
+    for _ in range(max(1, requests_per_minute // 60)):
+        limiter.acquire()
+    return limiter
+
+
+def wait_for_queue(limiter, length):
+    deadline = time.monotonic() + 2
+    while limiter.queue_length() < length:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_waiting_callers_are_admitted_in_arrival_order():
+    # Admissions are half a second apart, so every caller is queued before the first one leaves
+    limiter = drained_limiter(requests_per_minute=120)
+
+    admitted = []
+    def admit(name):
+        limiter.acquire()
+        admitted.append(name)
+
+    threads = []
+    for name in ("first", "second", "third"):
+        thread = threading.Thread(target=admit, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_for_queue(limiter, len(threads))
+
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert admitted == ["first", "second", "third"]
+
+
+def test_full_queue_rejects_new_callers():
+    limiter = drained_limiter(max_queue=1)
+
+    waiter = threading.Thread(target=limiter.acquire)
+    waiter.start()
+    wait_for_queue(limiter, 1)
+
+    with pytest.raises(QueueFullError):
+        limiter.acquire()
+    waiter.join(timeout=2)
+
+
+def test_waiting_caller_is_told_its_queue_position():
+    limiter = drained_limiter()
+
+    positions = []
+    limiter.acquire(on_wait=positions.append)
+
+    assert positions == [1]
+
+
+def test_retry_after_headers_are_read():
+    response = httpx.Response(429, headers={"retry-after-ms": "1500"}, request=REQUEST)
+    error = openai.RateLimitError("slow down", response=response, body=None)
+
+    assert get_retry_after(error) == 1.5
+
+
+class FlakyCompletions:
+    """Raise the given errors in turn, then answer."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.models = []
+
+    def create(self, model, **kwargs):
+        self.models.append(model)
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(choices=[], usage=None)
+
+
+def make_teacher(completions):
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return EnglishTeacher(client=client, limiter=RateLimiter(0), store=ConversationStore(), mistakes=MistakeIndex())
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(english_teacher, "get_retry_delay", lambda attempt, error: 0)
+    monkeypatch.setattr(Config, "RETRY_ATTEMPTS", 2)
+
+
+def test_transient_errors_are_retried(no_backoff):
+    completions = FlakyCompletions([openai.APITimeoutError(request=REQUEST)] * 2)
+    teacher = make_teacher(completions)
+
+    teacher._chat_completion(LABELS, ("gpt-4o-mini",), messages=[{"role": "user", "content": "Hi"}])
+
+    assert completions.models == ["gpt-4o-mini"] * 3
+
+
+def test_retries_stop_after_the_configured_attempts(no_backoff):
+    completions = FlakyCompletions([openai.APITimeoutError(request=REQUEST)] * 5)
+    teacher = make_teacher(completions)
+
+    with pytest.raises(openai.APITimeoutError):
+        teacher._chat_completion(LABELS, ("gpt-4o-mini",), messages=[{"role": "user", "content": "Hi"}])
+    assert len(completions.models) == 3
+
+
+def test_unavailable_model_falls_back_to_the_next_one(no_backoff):
+    not_found = openai.NotFoundError("no such model", response=httpx.Response(404, request=REQUEST), body=None)
+    completions = FlakyCompletions([not_found])
+    teacher = make_teacher(completions)
+
+    teacher._chat_completion(LABELS, ("gpt-4o", "gpt-4o-mini"), messages=[{"role": "user", "content": "Hi"}])
+
+    assert completions.models == ["gpt-4o", "gpt-4o-mini"]
+    assert teacher.last_models["reply"] == "gpt-4o-mini"
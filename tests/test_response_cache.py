@@ -0,0 +1,42 @@
+import time
+
+from english_teacher import ResponseCache
+
+
+def test_key_ignores_whitespace_but_not_model_or_prompt():
+    key = ResponseCache.make_key("gpt-4o-mini", "v1", "I  has a cat.\n", 0.3)
+    
+    assert key == ResponseCache.make_key("gpt-4o-mini", "v1", "I has a cat.", 0.3)
+    assert key != ResponseCache.make_key("gpt-4o", "v1", "I has a cat.", 0.3)
+    assert key != ResponseCache.make_key("gpt-4o-mini", "v2", "I has a cat.", 0.3)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", {"feedback": "a"})
+    cache.set("b", {"feedback": "b"})
+    cache.get("a")
+    cache.set("c", {"feedback": "c"})
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == {"feedback": "a"}
+    assert cache.get("c") == {"feedback": "c"}
+
+
+def test_expired_entries_miss():
+    cache = ResponseCache(ttl=0.01)
+    cache.set("a", {"feedback": "a"})
+    time.sleep(0.02)
+    
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_a_restart_and_creates_its_directory(tmp_path):
+    path = str(tmp_path / "cache" / "responses.sqlite3")
+    ResponseCache(path=path).set("a", {"feedback": "a"})
+    
+    restarted = ResponseCache(path=path)
+    
+    assert restarted.get("a") == {"feedback": "a"}
+    assert restarted.preload() == 1
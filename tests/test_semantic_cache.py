@@ -0,0 +1,29 @@
+import pytest
+
+from config import Config
+from semantic_cache import SemanticCache, embed
+
+THRESHOLD = Config.SEMANTIC_CACHE_THRESHOLDS["grammar"]
+
+
+@pytest.mark.parametrize("cached_text, feedback, text", [
+    ("She likes coffee and tea every morning.", "Your sentence is grammatically correct.",
+     "She like coffee and tea every morning."),
+    ("My brother is taller than me and my sister.", "No mistakes found.",
+     "My brother is more taller than me and my sister."),
+])
+def test_one_changed_word_is_not_served(cached_text, feedback, text):
+    cache = SemanticCache(max_entries=8)
+    cache.set("grammar", cached_text, {"feedback": feedback})
+    
+    assert float(embed(cached_text) @ embed(text)) >= THRESHOLD
+    assert cache.get("grammar", text, THRESHOLD) is None
+
+
+def test_casing_punctuation_and_names_are_served():
+    cache = SemanticCache(max_entries=8)
+    cache.set("grammar", "Yesterday I met Ana at the park and we talked for hours.", {"feedback": "No mistakes found."})
+    
+    hit = cache.get("grammar", "yesterday I met Maria at the park, and we talked for hours", THRESHOLD)
+    
+    assert hit == {"feedback": "No mistakes found."}